@@ -311,15 +311,21 @@ OUTPUT_DIR = DATA_DIR / "output"
 RECAT_ROOT = os.getenv("RECAT_ROOT", "/home/zhuxuzhou/recat")  # 重分类后的根目录
 BENCHMARK_FILE = os.getenv("BENCHMARK_FILE", "/mnt/tidal-alsh01/dataset/perceptionVLMData/processed_v1.5/bench/MMBench_DEV_EN_V11/MMBench_DEV_EN_V11.parquet")  # 基准parquet文件路径
 MATCH_OUTPUT_DIR = os.getenv("MATCH_OUTPUT_DIR", str(DATA_DIR / "matched_output"))  # 匹配结果输出目录
+MATCH_KEEP_IMAGES = os.getenv("MATCH_KEEP_IMAGES", "True").lower() == "true"  # 匹配结果中是否保留base64图片数据
 
 # 数据匹配测试模式配置
 MATCH_TEST_MODE = os.getenv("MATCH_TEST_MODE", "False").lower() == "false"  # 测试模式
 MATCH_TEST_SAMPLES = int(os.getenv("MATCH_TEST_SAMPLES", "5"))  # 测试模式下每个类别处理的样本数
 MATCH_TEST_MAX_CATEGORIES = int(os.getenv("MATCH_TEST_MAX_CATEGORIES", "2"))  # 测试模式下最多处理的类别数
 
+# 缓存配置
+CACHE_DIR = Path(os.getenv("CACHE_DIR", str(DATA_DIR / "cache")))  # 缓存目录
+ROUTER_CACHE_FILE = os.getenv("ROUTER_CACHE_FILE", str(CACHE_DIR / "router_cache.json"))  # 问题路由结果缓存文件
+
 # 创建必要的目录
 DATA_DIR.mkdir(exist_ok=True)
 INPUT_DIR.mkdir(exist_ok=True)
 OUTPUT_DIR.mkdir(exist_ok=True)
 Path(MATCH_OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
+CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -10,6 +10,7 @@ import argparse
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import time
 import gc
+import logging
 import os
 
 # 添加项目根目录到路径
@@ -40,8 +41,8 @@ def _process_image_worker(image_input, metadata: Optional[Dict] = None, gpu_id:
         if gpu_id is not None:
             os.environ['CUDA_VISIBLE_DEVICES'] = str(gpu_id)
         
-        # 在每个进程中独立创建Router和GeminiClient
-        router = Router()
+        # 在每个进程中独立创建Router和GeminiClient（临时Router不持久化匹配缓存）
+        router = Router(persist_cache=False)
         gemini_client = GeminiClient()
         
         # 分流
@@ -596,7 +597,7 @@ class ImageFilterSystem:
         print(f"[INFO] 开始从JSON文件读取数据: {json_path}")
         
         # 流式读取JSON文件
-        route_results = list(self.router.route_from_json(json_path))
+        route_results = list(self.router.route_from_json(json_path, router=self.router))
         total = len(route_results)
         
         print(f"[INFO] 共找到 {total} 条记录，开始处理，并发数: {self.max_workers if use_concurrent else 1}")
@@ -821,6 +822,9 @@ def main():
     
     args = parser.parse_args()
     
+    # 配置日志（Router等模块通过logging输出，逐条记录的调试信息在INFO级别下不输出）
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(name)s: %(message)s")
+    
     # 检查API密钥
     if not config.API_KEY:
         print("错误: 未设置API_KEY")
@@ -292,8 +292,11 @@
 数据分流器 - 基于语义相似度的路由匹配
 """
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, Optional, Any, Tuple, Union
 from enum import Enum
+import atexit
+import functools
+import logging
 import sys
 import re
 
@@ -306,6 +309,8 @@ from utils.data_matcher import match_data
 from utils.gemini_client import GeminiClient
 import config
 
+logger = logging.getLogger(__name__)
+
 
 class PipelineType(Enum):
     """Pipeline类型枚举"""
@@ -323,17 +328,36 @@ class PipelineType(Enum):
 class Router:
     """数据分流器 - 使用多种匹配策略"""
     
-    def __init__(self, use_llm: bool = True):
+    # 关键词匹配最高分领先次高分至少这么多时跳过LLM（1即最高分唯一）
+    KEYWORD_MARGIN = 1
+    
+    # pipeline类型字符串 -> PipelineType，用于无异常地校验LLM输出
+    _PT_BY_VALUE = {pt.value: pt for pt in PipelineType}
+    
+    def __init__(self, use_llm: bool = True, persist_cache: bool = True):
         """
         初始化分流器
         
         Args:
             use_llm: 是否使用LLM进行语义匹配（如果为False则使用关键词匹配）
+            persist_cache: 是否把问题匹配结果持久化到磁盘（仅在use_llm时生效），
+                跨进程复用LLM分类结果
         """
         self.use_llm = use_llm
         
+        # 问题 -> 匹配结果缓存（键为strip后的问题文本）
+        self._match_cache: Dict[str, List[PipelineType]] = {}
+        self._cache_file: Optional[Path] = None
+        
         if use_llm:
             self.gemini_client = GeminiClient()
+            # LLM prompt中与问题无关的部分对每个Router实例是常量，只构建一次
+            self._llm_prompt_prefix, self._llm_prompt_suffix = self._build_llm_prompt_parts()
+            
+            if persist_cache:
+                # 同一进程内的Router实例共享同一份缓存（只从磁盘加载一次，退出时统一写回）
+                self._cache_file = Path(config.ROUTER_CACHE_FILE)
+                self._match_cache = _shared_match_cache(self._cache_file)
         
         # 为每个pipeline定义关键词和模式（作为备选方案或快速预筛选）
         self.pipeline_keywords = {
@@ -374,18 +398,30 @@ class Router:
                 "patterns": [r"how\s+many", r"count.*in", r"number\s+of"]
             }
         }
+        
+        # 所有关键词和模式合并成一个正则，用于快速排除完全不匹配任何pipeline的问题
+        self._any_keyword = re.compile(
+            "|".join(
+                [re.escape(kw.lower()) for cfg in self.pipeline_keywords.values() for kw in cfg["keywords"]]
+                + [f"(?:{pattern})" for cfg in self.pipeline_keywords.values() for pattern in cfg["patterns"]]
+            ),
+            re.IGNORECASE
+        )
     
-    def _match_by_keywords(self, question: str) -> List[PipelineType]:
+    def _match_by_keywords(self, question_lower: str) -> Tuple[List[PipelineType], int, int]:
         """
         使用关键词和正则表达式匹配pipeline
         
         Args:
-            question: 问题文本
+            question_lower: 已经strip并转为小写的问题文本
             
         Returns:
-            匹配到的pipeline类型列表
+            (得分最高的pipeline类型列表, 最高分, 次高分)，并列最高时次高分等于最高分
         """
-        question_lower = question.lower().strip()
+        # 一次扫描即可判断是否有任何关键词/模式命中，全部未命中时直接返回
+        if not self._any_keyword.search(question_lower):
+            return [], 0, 0
+        
         matched_pipelines = []
         scores = {}
         
@@ -406,11 +442,14 @@ class Router:
                 scores[pipeline_type] = score
         
         # 按分数排序，返回得分最高的
+        top_score = second_score = 0
         if scores:
-            max_score = max(scores.values())
-            matched_pipelines = [pt for pt, score in scores.items() if score == max_score]
+            sorted_scores = sorted(scores.values(), reverse=True)
+            top_score = sorted_scores[0]
+            second_score = sorted_scores[1] if len(sorted_scores) > 1 else 0
+            matched_pipelines = [pt for pt, score in scores.items() if score == top_score]
         
-        return matched_pipelines
+        return matched_pipelines, top_score, second_score
     
     def _match_by_llm(self, question: str) -> List[PipelineType]:
         """
@@ -422,6 +461,43 @@ class Router:
         Returns:
             匹配到的pipeline类型列表
         """
+        prompt = self._llm_prompt_prefix + f'"{question}"' + self._llm_prompt_suffix
+
+        try:
+            response = self.gemini_client.analyze_image(
+                image_input="",  # 不需要图片，只分析文本
+                prompt=prompt,
+                temperature=0.3
+            )
+            
+            import json
+            # 提取JSON
+            json_match = re.search(r'\{.*\}', response, re.DOTALL)
+            if json_match:
+                result = json.loads(json_match.group())
+                pipeline_type_str = result.get("pipeline_type")
+                confidence = result.get("confidence", 0.5)
+                
+                # 转换为PipelineType（非法输出直接查表失败，不走异常路径）
+                pipeline_type = (
+                    Router._PT_BY_VALUE.get(pipeline_type_str)
+                    if isinstance(pipeline_type_str, str) else None
+                )
+                if pipeline_type is not None and confidence >= 0.6:  # 置信度阈值
+                    return [pipeline_type]
+            
+        except Exception as e:
+            logger.warning("LLM matching failed: %s", e)
+        
+        return []
+    
+    def _build_llm_prompt_parts(self) -> Tuple[str, str]:
+        """
+        构建LLM分类prompt中问题前后的固定部分
+        
+        Returns:
+            (prompt前缀, prompt后缀)
+        """
         # 构建pipeline描述
         pipeline_descriptions = {}
         for pipeline_type in PipelineType:
@@ -433,12 +509,14 @@ class Router:
                     "example_question": pipeline_config.get("question")
                 }
         
-        prompt = f"""You are a question classifier. Given a question about an image, classify it into one of the following categories.
+        prefix = f"""You are a question classifier. Given a question about an image, classify it into one of the following categories.
 
 Available Categories:
 {self._format_pipeline_descriptions(pipeline_descriptions)}
 
-Question to classify: "{question}"
+Question to classify: """
+        
+        suffix = """
 
 Analyze the question and determine which category it belongs to. Consider:
 1. The main intent of the question (what is being asked)
@@ -446,41 +524,76 @@ Analyze the question and determine which category it belongs to. Consider:
 3. The similarity to example questions
 
 Return ONLY a JSON object with this format:
-{{
+{
     "pipeline_type": "the matching category key (e.g., 'question', 'caption', etc.)",
     "confidence": a float between 0.0-1.0,
     "reasoning": "brief explanation of why this category matches"
-}}
+}
 
 Return only the JSON, no other text."""
-
+        
+        return prefix, suffix
+    
+    @staticmethod
+    def _load_match_cache(cache_file: Path) -> Dict[str, List[PipelineType]]:
+        """从磁盘加载问题匹配缓存，文件不存在或损坏时返回空缓存"""
+        import json
+        
+        if not cache_file.exists():
+            return {}
+        
         try:
-            response = self.gemini_client.analyze_image(
-                image_input="",  # 不需要图片，只分析文本
-                prompt=prompt,
-                temperature=0.3
-            )
-            
-            import json
-            # 提取JSON
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                result = json.loads(json_match.group())
-                pipeline_type_str = result.get("pipeline_type")
-                confidence = result.get("confidence", 0.5)
-                
-                # 转换为PipelineType
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                raw_cache = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Failed to load router cache %s: %s", cache_file, e)
+            return {}
+        
+        cache = {}
+        for question, values in raw_cache.items():
+            # 跳过pipeline类型已不存在的旧缓存项
+            if values and all(value in Router._PT_BY_VALUE for value in values):
+                cache[question] = [Router._PT_BY_VALUE[value] for value in values]
+        return cache
+    
+    @staticmethod
+    def _save_match_cache(cache_file: Path, cache: Dict[str, List[PipelineType]]) -> None:
+        """
+        把问题匹配缓存写回磁盘
+        
+        先合并磁盘上其他进程已写入的条目，再经唯一的临时文件原子替换，
+        多个进程同时写回时不会互相覆盖半写的文件
+        """
+        import json
+        import os
+        import tempfile
+        
+        if not cache:
+            return
+        
+        merged = Router._load_match_cache(cache_file)
+        merged.update(cache)
+        raw_cache = {
+            question: [pt.value for pt in pipeline_types]
+            for question, pipeline_types in merged.items()
+        }
+        tmp_name = None
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                'w', encoding='utf-8', dir=cache_file.parent,
+                prefix=cache_file.name + '.', suffix='.tmp', delete=False
+            ) as f:
+                tmp_name = f.name
+                json.dump(raw_cache, f, ensure_ascii=False)
+            os.replace(tmp_name, cache_file)
+        except OSError as e:
+            logger.warning("Failed to save router cache %s: %s", cache_file, e)
+            if tmp_name is not None:
                 try:
-                    pipeline_type = PipelineType(pipeline_type_str)
-                    if confidence >= 0.6:  # 置信度阈值
-                        return [pipeline_type]
-                except ValueError:
+                    os.unlink(tmp_name)
+                except OSError:
                     pass
-            
-        except Exception as e:
-            print(f"LLM matching failed: {e}")
-        
-        return []
     
     def _format_pipeline_descriptions(self, descriptions: Dict) -> str:
         """格式化pipeline描述用于LLM prompt"""
@@ -507,11 +620,32 @@ Return only the JSON, no other text."""
         
         question = question.strip()
         
+        # 命中缓存时直接返回，跳过关键词和LLM匹配
+        cached = self._match_cache.get(question)
+        if cached is not None:
+            return list(cached)
+        
+        matched = self._match_uncached(question)
+        # 使用LLM时多个结果说明LLM失败后回退到了关键词匹配，这种临时结果不缓存
+        if matched and (len(matched) == 1 or not self.use_llm):
+            self._match_cache[question] = matched
+        return list(matched)
+    
+    def _match_uncached(self, question: str) -> List[PipelineType]:
+        """
+        不经缓存地匹配问题对应的pipeline
+        
+        Args:
+            question: strip后的问题文本
+            
+        Returns:
+            匹配到的pipeline类型列表
+        """
         # 策略1: 先使用关键词快速匹配
-        keyword_matches = self._match_by_keywords(question)
+        keyword_matches, top_score, second_score = self._match_by_keywords(question.lower())
         
-        if keyword_matches and len(keyword_matches) == 1:
-            # 如果关键词匹配唯一，直接返回
+        if keyword_matches and top_score - second_score >= self.KEYWORD_MARGIN:
+            # 如果关键词匹配的最高分领先次高分足够多，直接返回，不再调用LLM
             return keyword_matches
         
         # 策略2: 如果关键词匹配不明确或没有匹配，使用LLM
@@ -526,6 +660,24 @@ Return only the JSON, no other text."""
         
         return []
     
+    def _batch_match(self, questions: List[str]) -> List[List[PipelineType]]:
+        """
+        批量匹配问题对应的pipeline（相同问题只匹配一次）
+        
+        Args:
+            questions: 问题文本列表
+            
+        Returns:
+            与questions一一对应的pipeline类型列表
+        """
+        matched: Dict[str, List[PipelineType]] = {}
+        for question in questions:
+            if question not in matched:
+                matched[question] = self._match_pipeline_by_question(question)
+        
+        # 每条结果使用独立的列表，避免下游修改时互相影响
+        return [list(matched[question]) for question in questions]
+    
     def route(self, image_input: Union[str, Path], metadata: Optional[Dict] = None) -> List[PipelineType]:
         """
         将图片分流到对应的pipeline
@@ -555,7 +707,7 @@ Return only the JSON, no other text."""
             if matched:
                 return matched
             else:
-                print(f"Warning: No pipeline matched for question: {question}")
+                logger.debug("No pipeline matched for question: %s", question)
         
         # 如果没有匹配到，返回空列表或默认pipeline
         return []
@@ -575,13 +727,19 @@ Return only the JSON, no other text."""
         return routes[0] if routes else None
     
     @staticmethod
-    def route_from_json(json_file: Path, use_llm: bool = True) -> List[Dict[str, Any]]:
+    def route_from_json(
+        json_file: Path,
+        use_llm: bool = True,
+        *,
+        router: Optional["Router"] = None
+    ) -> List[Dict[str, Any]]:
         """
         从JSON文件中读取数据并根据question字段路由到对应的pipeline
         
         Args:
             json_file: JSON文件路径
-            use_llm: 是否使用LLM进行语义匹配
+            use_llm: 是否使用LLM进行语义匹配（仅在router为None时生效）
+            router: 已有的Router实例（仅限关键字参数），为None时复用按use_llm缓存的默认实例
             
         Returns:
             路由结果列表
@@ -597,29 +755,40 @@ Return only the JSON, no other text."""
         if not isinstance(data, list):
             raise ValueError(f"JSON file should contain a list, got {type(data)}")
         
-        router = Router(use_llm=use_llm)
-        results = []
+        if router is None:
+            router = _default_router(use_llm)
         
+        # 第一遍：按列抽取需要路由的条目（问题、图片输入和原始数据项各自成列）
+        items = []
+        questions = []
+        image_inputs = []
         for item in data:
             source_b = item.get("source_b")
             if not source_b:
-                print("Warning: No source_b found, skipping item")
+                logger.debug("No source_b found, skipping item")
                 continue
             
             question = source_b.get("question")
             if not question:
-                print("Warning: No question found in source_b, skipping item")
+                logger.debug("No question found in source_b, skipping item")
                 continue
             
             # 获取图片路径
             image_input = Router._extract_image_input(item)
             if image_input is None:
-                print("Error: No image input found, skipping item")
+                logger.warning("No image input found, skipping item")
                 continue
             
-            # 路由匹配
-            pipeline_types = router._match_pipeline_by_question(question)
-            
+            items.append(item)
+            questions.append(question)
+            image_inputs.append(image_input)
+        
+        # 第二遍：批量路由匹配所有问题
+        pipeline_types_list = router._batch_match(questions)
+        
+        # 第三遍：按原顺序组装结果
+        results = []
+        for item, question, image_input, pipeline_types in zip(items, questions, image_inputs, pipeline_types_list):
             results.append({
                 "sample_index": item.get("sample_index"),
                 "id": item.get("id"),
@@ -627,7 +796,7 @@ Return only the JSON, no other text."""
                 "question": question,
                 "pipeline_types": pipeline_types,  # 直接保存PipelineType对象
                 "source_a": item.get("source_a", {}),
-                "source_b": source_b
+                "source_b": item["source_b"]
             })
         
         return results
@@ -657,7 +826,7 @@ Return only the JSON, no other text."""
         # 如果 source_a 没有，再从 source_b 中找
         for key in IMAGE_KEYS:
             if key in source_b and source_b[key]:
-                print("Warning: Using image from source_b")
+                logger.debug("Using image from source_b")
                 return source_b[key]
         
         return None
@@ -670,7 +839,8 @@ Return only the JSON, no other text."""
         target_categories: Optional[list] = None,
         test_mode: Optional[bool] = None,
         test_samples: Optional[int] = None,
-        test_max_categories: Optional[int] = None
+        test_max_categories: Optional[int] = None,
+        keep_images: Optional[bool] = None
     ) -> str:
         """数据匹配函数"""
         test_mode = test_mode if test_mode is not None else config.MATCH_TEST_MODE
@@ -684,5 +854,32 @@ Return only the JSON, no other text."""
             target_categories=target_categories,
             test_mode=test_mode,
             test_samples=test_samples,
-            test_max_categories=test_max_categories
-        )
\ No newline at end of file
+            test_max_categories=test_max_categories,
+            keep_images=keep_images
+        )
+
+
+# 缓存文件路径 -> 本进程共享的问题匹配缓存（每个文件只加载一次）
+_PERSISTENT_CACHES: Dict[Path, Dict[str, List[PipelineType]]] = {}
+
+
+def _shared_match_cache(cache_file: Path) -> Dict[str, List[PipelineType]]:
+    """获取本进程共享的持久化匹配缓存，首次访问时从磁盘加载"""
+    cache = _PERSISTENT_CACHES.get(cache_file)
+    if cache is None:
+        cache = Router._load_match_cache(cache_file)
+        _PERSISTENT_CACHES[cache_file] = cache
+    return cache
+
+
+@atexit.register
+def _save_match_caches() -> None:
+    """进程退出时把本进程的共享缓存写回磁盘（模块级只注册一次，不持有Router实例）"""
+    for cache_file, cache in _PERSISTENT_CACHES.items():
+        Router._save_match_cache(cache_file, cache)
+
+
+@functools.lru_cache(maxsize=2)
+def _default_router(use_llm: bool) -> Router:
+    """获取默认Router实例（按use_llm缓存，避免重复创建GeminiClient和编译正则）"""
+    return Router(use_llm=use_llm)
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共配置：把项目根目录加入路径，以便导入utils包
+"""
+import sys
+from pathlib import Path
+
+_project_root = str(Path(__file__).resolve().parent.parent)
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+utils/data_matcher.py 的测试
+"""
+import json
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from utils import data_matcher as dm
+
+
+def _read_output(output_dir, name):
+    return json.loads((output_dir / "c" / "l" / f"{name}.json").read_text())
+
+
+def test_corrupt_parquet_does_not_stop_category(tmp_path):
+    cat_dir = tmp_path / "cat"
+    cat_dir.mkdir()
+    for name in "abc":
+        pq.write_table(pa.table({"id": list(range(1000))}), cat_dir / f"{name}.parquet", row_group_size=100)
+    # 破坏b的数据页（文件头尾完好，打开成功，读取批次时才报错）
+    corrupt = cat_dir / "b.parquet"
+    raw = bytearray(corrupt.read_bytes())
+    raw[2000:3000] = b"\0" * 1000
+    corrupt.write_bytes(bytes(raw))
+    
+    output_dir = tmp_path / "out"
+    dm.process_category("c", "l", str(cat_dir), dm.BenchmarkIndex(pa.table({"index": [1]})), str(output_dir))
+    
+    assert len(_read_output(output_dir, "a")) == 1000
+    assert len(_read_output(output_dir, "c")) == 1000
+    # 出错文件的输出仍是完整的JSON数组
+    assert isinstance(_read_output(output_dir, "b"), list)
+
+
+@pytest.mark.parametrize("keep_images", [True, False])
+def test_has_image_flags_do_not_depend_on_elided_bytes(tmp_path, keep_images):
+    cat_dir = tmp_path / "cat"
+    cat_dir.mkdir()
+    jpeg = b"\xff\xd8\xff" + b"a" * 60
+    pq.write_table(pa.table({"id": [1, 2], "jpg": [jpeg, None]}), cat_dir / "a.parquet")
+    benchmark = dm.BenchmarkIndex(pa.table({"index": [1], "img": [b"\x89PNG\r\n\x1a\n" + b"z" * 60]}))
+    
+    output_dir = tmp_path / "out"
+    dm.process_category("c", "l", str(cat_dir), benchmark, str(output_dir), keep_images=keep_images)
+    
+    records = _read_output(output_dir, "a")
+    assert [(r["has_image_a"], r["has_image_b"]) for r in records] == [(True, True), (False, False)]
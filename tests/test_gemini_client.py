@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+utils/gemini_client.py 中响应解析的测试
+"""
+import json
+
+import pytest
+
+# gemini_client依赖内部的redeuler客户端（缺失时会在导入阶段尝试pip安装），未安装时跳过
+pytest.importorskip("redeuler.client.openai")
+
+from utils.gemini_client import GeminiClient
+
+
+@pytest.fixture
+def extract():
+    client = GeminiClient.__new__(GeminiClient)  # 只测试解析逻辑，不创建API客户端
+    return client._extract_json_from_response
+
+
+def test_nested_object(extract):
+    text = 'Result: {"passed": true, "detail": {"a": 1}, "total_score": 0.8} done'
+    assert extract(text) == {"passed": True, "detail": {"a": 1}, "total_score": 0.8}
+
+
+def test_code_block(extract):
+    text = 'Here:\n```json\n{"passed": false, "total_score": 0.0}\n```'
+    assert extract(text) == {"passed": False, "total_score": 0.0}
+
+
+def test_skips_unparsable_braces_before_the_object(extract):
+    text = 'Format: {passed, total_score}. Answer: {"passed": true, "total_score": 0.5}'
+    assert extract(text) == {"passed": True, "total_score": 0.5}
+
+
+def test_truncated_reply_does_not_return_inner_object(extract):
+    text = '{"passed": true, "detail": {"a": 1}, "total_score": 0.'
+    with pytest.raises(json.JSONDecodeError):
+        extract(text)
+
+
+def test_trailing_comma_does_not_return_inner_object(extract):
+    text = '{"passed": true, "detail": {"a": 1}, "total_score": 0.9,}'
+    try:
+        import json5  # noqa: F401
+    except ImportError:
+        with pytest.raises(json.JSONDecodeError):
+            extract(text)
+    else:
+        assert extract(text) == {"passed": True, "detail": {"a": 1}, "total_score": 0.9}
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+utils/json_io.py 的测试
+"""
+import json
+
+import pytest
+
+from utils import json_io
+
+BIG = 2 ** 70
+
+
+def test_loads_keeps_integers_beyond_64_bits():
+    assert json_io.loads(json.dumps([BIG, -BIG, 1.5]).encode()) == [BIG, -BIG, 1.5]
+
+
+def test_loads_accepts_nan():
+    data = json_io.loads(b'[NaN]')
+    assert data[0] != data[0]
+
+
+def test_load_json_mmap_path_keeps_big_integers(tmp_path):
+    # 超过_MMAP_MIN_SIZE的文件走mmap路径
+    records = [{"big": BIG, "pad": "x" * 1024} for _ in range(1100)]
+    path = tmp_path / "big.json"
+    path.write_text(json.dumps(records))
+    assert json_io.load_json(path) == records
+
+
+def test_dumps_falls_back_for_big_integers():
+    assert json.loads(json_io.dumps({"big": BIG})) == {"big": BIG}
+    assert json.loads(json_io.dumps_line({"big": BIG})) == {"big": BIG}
+
+
+def test_stream_items_resumes_after_integer_overflow(tmp_path):
+    if json_io.ijson is None:
+        pytest.skip("ijson未安装")
+    records = [{"id": i, "score": 0.5} for i in range(5)] + [{"big": BIG}] + [{"id": 6}]
+    path = tmp_path / "input.json"
+    path.write_text(json.dumps(records))
+    assert list(json_io.stream_items(path)) == records
+
+
+def test_stream_items_raises_on_malformed_input(tmp_path):
+    if json_io.ijson is None:
+        pytest.skip("ijson未安装")
+    path = tmp_path / "input.json"
+    path.write_text('[{"id": 1}, {"id": ')
+    with pytest.raises(json_io.ijson.JSONError):
+        list(json_io.stream_items(path))
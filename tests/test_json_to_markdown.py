@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""
+utils/json_to_markdown.py 的测试
+"""
+import base64
+
+from utils import json_to_markdown as j2m
+
+JPEG = b"\xff\xd8\xff\xe0" + bytes(range(256)) * 2
+
+
+def test_valid_base64_image():
+    assert j2m.is_base64_image(base64.b64encode(JPEG).decode()) == (True, "jpeg")
+
+
+def test_invalid_payload_after_valid_header_is_rejected():
+    encoded = base64.b64encode(JPEG).decode()
+    corrupted = encoded[:40] + "!!!!" + encoded[44:]
+    assert j2m.is_base64_image(corrupted) == (False, None)
+
+
+def test_undecodable_asset_falls_back_to_none(tmp_path):
+    assert j2m._write_image_asset("abc", "png", tmp_path / "assets", {}) is None
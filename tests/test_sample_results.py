@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+utils/sample_results.py 的测试
+"""
+import json
+
+import pytest
+
+from utils import sample_results as sr
+
+BIG = 2 ** 70
+
+
+def _write_input(tmp_path, n=20):
+    path = tmp_path / "input.json"
+    path.write_text(json.dumps([{"id": i, "big": BIG + i} for i in range(n)]))
+    return path
+
+
+def test_in_memory_sampling_keeps_big_integers(tmp_path, monkeypatch):
+    monkeypatch.setattr(sr, "ijson", None)
+    output = tmp_path / "out.json"
+    sr.sample_results(_write_input(tmp_path), output, n=3)
+    sampled = json.loads(output.read_text())
+    assert len(sampled) == 3
+    assert all(item["big"] == BIG + item["id"] for item in sampled)
+
+
+def test_streaming_sampling_keeps_big_integers(tmp_path):
+    if sr.ijson is None:
+        pytest.skip("ijson未安装")
+    output = tmp_path / "out.json"
+    sr.sample_results(_write_input(tmp_path), output, n=3, preserve_order=True)
+    sampled = json.loads(output.read_text())
+    assert len(sampled) == 3
+    assert [item["id"] for item in sampled] == sorted(item["id"] for item in sampled)
+    assert all(item["big"] == BIG + item["id"] for item in sampled)
+
+
+def test_seeded_sample_does_not_depend_on_ijson(tmp_path, monkeypatch):
+    input_file = _write_input(tmp_path)
+    with_ijson, without_ijson = tmp_path / "a.json", tmp_path / "b.json"
+    sr.sample_results(input_file, with_ijson, n=3, seed=1)
+    monkeypatch.setattr(sr, "ijson", None)
+    sr.sample_results(input_file, without_ijson, n=3, seed=1)
+    ids = [item["id"] for item in json.loads(with_ijson.read_text())]
+    assert ids == [item["id"] for item in json.loads(without_ijson.read_text())]
+    # 与random.sample在同一种子下选出的位置一致
+    assert ids == [4, 18, 2]
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+utils/split_by_score.py 的测试
+"""
+import json
+
+import pytest
+
+from utils import split_by_score as sbs
+
+BIG = 2 ** 70
+
+
+def _run(tmp_path, records, **kwargs):
+    input_file = tmp_path / "input.json"
+    input_file.write_text(json.dumps(records))
+    high, low = tmp_path / "h.json", tmp_path / "l.json"
+    counts = sbs.split_by_score(input_file, high, low, **kwargs)
+    return counts, high, low
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_integers_beyond_64_bits(tmp_path, monkeypatch, streaming):
+    if not streaming:
+        monkeypatch.setattr(sbs, "ijson", None)
+    elif sbs.ijson is None:
+        pytest.skip("ijson未安装")
+    records = [{"id": i, "big": BIG, "total_score": i / 10} for i in range(10)]
+    counts, high, low = _run(tmp_path, records)
+    assert counts == (4, 6)
+    assert json.loads(high.read_text()) == records[6:]
+    assert json.loads(low.read_text()) == records[:6]
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_non_numeric_score_leaves_no_outputs(tmp_path, monkeypatch, streaming):
+    if not streaming:
+        monkeypatch.setattr(sbs, "ijson", None)
+    elif sbs.ijson is None:
+        pytest.skip("ijson未安装")
+    records = [{"total_score": 0.7}, {"total_score": 0.1}, {"total_score": "0.7"}]
+    with pytest.raises(TypeError):
+        _run(tmp_path, records)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["input.json"]
+
+
+def test_no_score_records_written_separately(tmp_path):
+    records = [{"total_score": 0.7}, {"error": "x"}]
+    counts, high, low = _run(tmp_path, records)
+    assert counts == (1, 0)
+    assert json.loads((tmp_path / "l_no_score.json").read_text()) == [{"error": "x"}]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["h.json", "input.json", "l.json", "l_no_score.json"]
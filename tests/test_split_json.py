@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+utils/split_json.py 的测试
+"""
+import json
+
+import pytest
+
+from utils import split_json as sj
+
+BIG = 2 ** 70
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_split_and_merge_integers_beyond_64_bits(tmp_path, monkeypatch, streaming):
+    if not streaming:
+        monkeypatch.setattr(sj, "ijson", None)
+    elif sj.ijson is None:
+        pytest.skip("ijson未安装")
+    records = [{"id": i, "big": BIG + i, "score": 0.5} for i in range(35)]
+    input_file = tmp_path / "input.json"
+    input_file.write_text(json.dumps(records))
+    
+    output_files = sj.split_json(input_file, tmp_path / "out", chunk_size=10)
+    assert [p.name for p in output_files] == [f"chunk_{i:04d}_of_0004.json" for i in range(1, 5)]
+    
+    merged = tmp_path / "merged.json"
+    sj.merge_results(output_files, merged)
+    assert json.loads(merged.read_text()) == records
+
+
+def test_failed_split_leaves_no_chunks(tmp_path, monkeypatch):
+    records = [{"id": i} for i in range(35)]
+    input_file = tmp_path / "input.json"
+    input_file.write_text(json.dumps(records))
+    
+    write_chunk = sj._write_chunk
+    
+    def failing_write_chunk(writer_cls, output_file, batch, pretty=False):
+        if batch[0]["id"] == 20:
+            raise OSError("disk full")
+        return write_chunk(writer_cls, output_file, batch, pretty)
+    
+    monkeypatch.setattr(sj, "_write_chunk", failing_write_chunk)
+    output_dir = tmp_path / "out"
+    with pytest.raises(OSError):
+        sj.split_json(input_file, output_dir, chunk_size=10)
+    assert list(output_dir.iterdir()) == []
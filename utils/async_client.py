@@ -3,15 +3,76 @@
 """
 import asyncio
 import aiohttp
-import base64
 import io
 import json
 import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Union, Optional, List, Dict, Any
+from typing import Union, Optional, List, Dict, Any, Tuple
 from PIL import Image
 import config
 import os
+from utils.check_file_limits import ensure_file_limit
+
+# OpenCV为可选依赖：可用时用cv2.imencode编码JPEG（比Pillow更快），否则回退到Pillow
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    cv2 = None
+    np = None
+
+# pybase64为可选依赖：SIMD加速的base64编解码，接口与标准库base64一致
+try:
+    import pybase64 as b64
+except ImportError:
+    import base64 as b64
+
+# orjson为可选依赖：解析响应JSON更快，未安装时回退到标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 预编译的正则表达式（每张图片/每个响应都会用到）
+_WS_RE = re.compile(r'\s')
+_JSON_BLOCK_RE = re.compile(r'```(?:json)?\s*(\{.*?\})\s*```', re.DOTALL)
+_JSON_ARRAY_BLOCK_RE = re.compile(r'```(?:json)?\s*(\[.*?\])\s*```', re.DOTALL)
+
+# JPEG文件头魔数和JPEG data URI前缀（已是JPEG的输入无需重新编码）
+_JPEG_MAGIC = b'\xff\xd8\xff'
+_JPEG_DATA_URI_PREFIX = 'data:image/jpeg;base64,'
+
+# 图片编码（JPEG + base64）是CPU密集操作，放到线程池中执行，避免阻塞事件循环
+_ENCODE_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="image-encode")
+
+
+def create_session(
+    api_key: Optional[str] = None,
+    connector: Optional[aiohttp.BaseConnector] = None
+) -> aiohttp.ClientSession:
+    """
+    创建带认证头的aiohttp会话（需在事件循环中调用）
+    
+    Args:
+        api_key: API密钥，为None时从config读取
+        connector: 连接器，为None时使用aiohttp默认连接器
+        
+    Returns:
+        ClientSession实例，调用方负责关闭
+    """
+    headers = {
+        "Authorization": f"Bearer {api_key or config.API_KEY}",
+        "Content-Type": "application/json",
+        "Connection": "keep-alive"
+    }
+    # 总超时5分钟；建连超时单独限制，避免连接阶段卡住占满整个总超时
+    timeout = aiohttp.ClientTimeout(total=300, connect=10, sock_connect=10, sock_read=120)
+    return aiohttp.ClientSession(
+        headers=headers,
+        timeout=timeout,
+        connector=connector
+    )
 
 
 class AsyncGeminiClient:
@@ -19,7 +80,7 @@ class AsyncGeminiClient:
     
     def __init__(self, api_key: Optional[str] = None, model_name: Optional[str] = None, 
                  base_url: Optional[str] = None, gpu_id: Optional[int] = None,
-                 max_concurrent: int = 10):
+                 max_concurrent: int = 10, session: Optional[aiohttp.ClientSession] = None):
         """
         初始化异步客户端
         
@@ -28,7 +89,9 @@ class AsyncGeminiClient:
             model_name: 模型名称
             base_url: API基础URL
             gpu_id: 绑定的GPU ID（用于进程隔离，不影响API调用）
-            max_concurrent: 最大并发请求数
+            max_concurrent: 最大并发请求数（自建会话时作为连接器的连接数上限）
+            session: 外部共享的会话（多个客户端共用连接池），由调用方负责关闭；
+                为None时在进入上下文时自行创建
         """
         self.api_key = api_key or config.API_KEY
         self.model_name = model_name or config.MODEL_NAME
@@ -42,41 +105,141 @@ class AsyncGeminiClient:
         if not self.base_url:
             raise ValueError("Base URL未设置")
         
+        # 高并发连接需要足够的文件描述符（已满足时为空操作）
+        ensure_file_limit()
+        
         # 设置GPU可见性（用于进程隔离）
         if gpu_id is not None:
             os.environ['CUDA_VISIBLE_DEVICES'] = str(gpu_id)
             print(f"[INFO] GPU绑定: GPU {gpu_id}")
         
-        # 创建会话
-        self.session: Optional[aiohttp.ClientSession] = None
+        # 限制本客户端同时进行的请求数（包括图片编码）：等待中的请求还未编码图片，
+        # 内存占用不随排队请求数增长
         self.semaphore = asyncio.Semaphore(max_concurrent)
+        
+        # 会话（外部传入时共享，不由本客户端关闭）
+        self.session: Optional[aiohttp.ClientSession] = session
+        self._owns_session = session is None
     
     async def __aenter__(self):
         """异步上下文管理器入口"""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        timeout = aiohttp.ClientTimeout(total=300)  # 5分钟超时
-        self.session = aiohttp.ClientSession(
-            headers=headers,
-            timeout=timeout
-        )
+        if self.session is None:
+            # 连接器的连接数上限与max_concurrent一致；
+            # 缓存DNS解析结果，保持keep-alive连接，并及时清理异常关闭的TLS连接
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrent,
+                limit_per_host=self.max_concurrent,
+                ttl_dns_cache=300,
+                use_dns_cache=True,
+                keepalive_timeout=75,
+                enable_cleanup_closed=True
+            )
+            self.session = create_session(self.api_key, connector=connector)
+            self._owns_session = True
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """异步上下文管理器出口"""
-        if self.session:
+        if self.session and self._owns_session:
             await self.session.close()
+            self.session = None
     
     def _encode_image(self, image_input: Union[str, Path, bytes, Image.Image]) -> str:
         """编码图片为base64"""
+        # 输入本身已经是JPEG时直接使用，跳过解码+重新编码
+        if isinstance(image_input, (bytes, bytearray)) and image_input[:3] == _JPEG_MAGIC:
+            return b64.b64encode(image_input).decode('ascii')
+        if isinstance(image_input, str) and image_input.startswith(_JPEG_DATA_URI_PREFIX):
+            return image_input[len(_JPEG_DATA_URI_PREFIX):]
+        
+        if cv2 is not None:
+            image_array = self._decode_to_bgr(image_input)
+            if image_array is not None:
+                ok, buffer = cv2.imencode(
+                    '.jpg', image_array,
+                    [cv2.IMWRITE_JPEG_QUALITY, 85, cv2.IMWRITE_JPEG_OPTIMIZE, 1]
+                )
+                if ok:
+                    return b64.b64encode(buffer.tobytes()).decode('ascii')
+        
+        return self._encode_image_pil(image_input)
+    
+    def _decode_to_bgr(self, image_input: Union[str, Path, bytes, Image.Image]) -> Optional["np.ndarray"]:
+        """
+        把图片输入转换为可直接交给cv2.imencode的8位BGR（或灰度）数组
+        
+        Returns:
+            图片数组，无法用OpenCV处理时返回None（由调用方回退到Pillow）
+        """
+        if isinstance(image_input, Image.Image):
+            image = image_input
+            if image.mode == 'RGBA':
+                rgb_image = Image.new('RGB', image.size, (255, 255, 255))
+                rgb_image.paste(image, mask=image.getchannel('A'))
+                image = rgb_image
+            elif image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            
+            image_array = np.asarray(image)
+            if image_array.ndim == 3:
+                image_array = np.ascontiguousarray(image_array[:, :, ::-1])  # RGB -> BGR
+            return image_array
+        
+        image_bytes = self._read_image_bytes(image_input)
+        image_array = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_UNCHANGED)
+        if image_array is None or image_array.dtype != np.uint8:
+            return None
+        
+        if image_array.ndim == 3 and image_array.shape[2] == 4:
+            # 带透明通道时与Pillow路径一致，合成到白色背景上
+            alpha = image_array[:, :, 3:4].astype(np.float32) / 255.0
+            image_array = (image_array[:, :, :3] * alpha + 255.0 * (1.0 - alpha)).astype(np.uint8)
+        
+        return image_array
+    
+    def _read_image_bytes(self, image_input: Union[str, Path, bytes]) -> bytes:
+        """读取图片的原始编码字节（bytes、base64字符串或文件路径）"""
+        if isinstance(image_input, bytes):
+            return image_input
+        
+        if isinstance(image_input, (str, Path)):
+            image_str = str(image_input)
+            
+            if image_str.startswith(('http://', 'https://')):
+                raise ValueError("URL图片需要异步下载，请使用load_image_async")
+            
+            base64_data = self._extract_base64(image_str)
+            if base64_data:
+                return b64.b64decode(base64_data, validate=False)
+            
+            with open(image_input, 'rb') as f:
+                return f.read()
+        
+        raise ValueError(f"不支持的图片类型: {type(image_input)}")
+    
+    def _extract_base64(self, image_str: str) -> Optional[str]:
+        """如果字符串是data URI或base64编码的图片，返回其中的base64数据，否则返回None"""
+        if image_str.startswith('data:image'):
+            return image_str.split(',', 1)[1]
+        
+        if len(image_str) > 100:
+            try:
+                clean_str = _WS_RE.sub('', image_str)
+                b64.b64decode(clean_str, validate=False)
+                return clean_str
+            except:
+                return None
+        
+        return None
+    
+    def _encode_image_pil(self, image_input: Union[str, Path, bytes, Image.Image]) -> str:
+        """使用Pillow编码图片为base64（未安装OpenCV或OpenCV无法解码时使用）"""
         try:
             image = self._load_image(image_input)
             
             if image.mode == 'RGBA':
                 rgb_image = Image.new('RGB', image.size, (255, 255, 255))
-                rgb_image.paste(image, mask=image.split()[3])
+                rgb_image.paste(image, mask=image.getchannel('A'))
                 image.close()
                 image = rgb_image
             elif image.mode not in ('RGB', 'L'):
@@ -85,7 +248,7 @@ class AsyncGeminiClient:
             buffer = io.BytesIO()
             image.save(buffer, format='JPEG', quality=85, optimize=True)
             buffer.seek(0)
-            image_base64 = base64.b64encode(buffer.read()).decode('utf-8')
+            image_base64 = b64.b64encode(buffer.read()).decode('ascii')
             buffer.close()
             
             return image_base64
@@ -111,20 +274,9 @@ class AsyncGeminiClient:
                 # URL需要异步下载，这里先不支持
                 raise ValueError("URL图片需要异步下载，请使用load_image_async")
             
-            if image_str.startswith('data:image'):
-                base64_data = image_str.split(',', 1)[1]
-            elif len(image_str) > 100:
-                try:
-                    clean_str = re.sub(r'\s', '', image_str)
-                    base64.b64decode(clean_str)
-                    base64_data = clean_str
-                except:
-                    base64_data = None
-            else:
-                base64_data = None
-            
+            base64_data = self._extract_base64(image_str)
             if base64_data:
-                image_bytes = base64.b64decode(base64_data)
+                image_bytes = b64.b64decode(base64_data, validate=False)
                 return Image.open(io.BytesIO(image_bytes))
             else:
                 return Image.open(image_input)
@@ -148,29 +300,53 @@ class AsyncGeminiClient:
         Returns:
             响应文本
         """
-        async with self.semaphore:  # 限制并发数
-            if not self.session:
-                raise RuntimeError("Session not initialized. Use async with statement.")
+        return await self.analyze_images_async([image_input], prompt, temperature)
+    
+    async def analyze_images_async(
+        self,
+        image_inputs: List[Union[str, Path, bytes, Image.Image]],
+        prompt: str,
+        temperature: float = 0.7
+    ) -> str:
+        """
+        异步分析多张图片（所有图片放在同一条消息中，共享一份提示词）
+        
+        Args:
+            image_inputs: 图片输入列表
+            prompt: 提示词
+            temperature: 温度参数
             
-            # 编码图片
-            image_base64 = self._encode_image(image_input)
+        Returns:
+            响应文本
+        """
+        if not self.session:
+            raise RuntimeError("Session not initialized. Use async with statement.")
+        
+        # 先取得并发名额再编码图片，同时只有max_concurrent个请求的图片数据在内存中
+        async with self.semaphore:
+            # 编码图片（在线程池中执行，编码期间事件循环可以继续处理其他请求）
+            loop = asyncio.get_running_loop()
+            images_base64 = await asyncio.gather(*[
+                loop.run_in_executor(_ENCODE_EXECUTOR, self._encode_image, image_input)
+                for image_input in image_inputs
+            ])
             
             # 构建请求
             url = f"{self.base_url}/chat/completions"
+            content = [{"type": "text", "text": prompt}]
+            for image_base64 in images_base64:
+                content.append({
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/jpeg;base64,{image_base64}"
+                    }
+                })
             payload = {
                 "model": self.model_name,
                 "messages": [
                     {
                         "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{image_base64}"
-                                }
-                            }
-                        ]
+                        "content": content
                     }
                 ],
                 "stream": False,
@@ -202,7 +378,125 @@ class AsyncGeminiClient:
         Returns:
             筛选结果字典
         """
-        prompt = """
+        prompt = self._build_filter_prompt(criteria_description, question)
+        
+        try:
+            response_text = await self.analyze_image_async(image_input, prompt, temperature)
+            
+            # 解析JSON响应
+            json_block_match = _JSON_BLOCK_RE.search(response_text)
+            if json_block_match:
+                response_text = json_block_match.group(1)
+            else:
+                start_idx = response_text.find('{')
+                if start_idx != -1:
+                    brace_count = 0
+                    for i in range(start_idx, len(response_text)):
+                        if response_text[i] == '{':
+                            brace_count += 1
+                        elif response_text[i] == '}':
+                            brace_count -= 1
+                            if brace_count == 0 and '"passed"' in response_text[start_idx:i+1]:
+                                response_text = response_text[start_idx:i+1]
+                                break
+            
+            result = orjson.loads(response_text) if orjson is not None else json.loads(response_text)
+            
+            return self._normalize_filter_result(result)
+            
+        except Exception as e:
+            return {
+                "passed": False,
+                "reason": f"筛选过程出错: {str(e)}",
+                "confidence": 0.0
+            }
+    
+    async def filter_images_async(
+        self,
+        image_inputs: List[Union[str, Path, bytes, Image.Image]],
+        criteria_description: str,
+        question: str,
+        temperature: float = 0.3
+    ) -> List[dict]:
+        """
+        异步批量筛选多张使用相同筛选标准和问题的图片（一次请求，共享提示词）
+        
+        Args:
+            image_inputs: 图片输入列表
+            criteria_description: 筛选标准描述
+            question: 问题描述
+            
+        Returns:
+            与image_inputs一一对应的筛选结果字典列表
+        """
+        if len(image_inputs) == 1:
+            return [await self.filter_image_async(image_inputs[0], criteria_description, question, temperature)]
+        
+        num_images = len(image_inputs)
+        prompt = self._build_filter_prompt(criteria_description, question) + f"""
+
+IMPORTANT: {num_images} images are attached, in order. Evaluate each image independently using the rules above.
+Return a JSON array ONLY, containing exactly {num_images} objects in the same order as the images, each object using the format above."""
+        
+        try:
+            response_text = await self.analyze_images_async(image_inputs, prompt, temperature)
+        except Exception as e:
+            return [
+                {
+                    "passed": False,
+                    "reason": f"筛选过程出错: {str(e)}",
+                    "confidence": 0.0
+                }
+                for _ in image_inputs
+            ]
+        
+        results = self._parse_json_array(response_text)
+        if results is None or len(results) != num_images or not all(isinstance(r, dict) for r in results):
+            # 批量响应无法与图片一一对应时，逐张重新筛选
+            return list(await asyncio.gather(*[
+                self.filter_image_async(image_input, criteria_description, question, temperature)
+                for image_input in image_inputs
+            ]))
+        
+        return [self._normalize_filter_result(result) for result in results]
+    
+    @staticmethod
+    def _parse_json_array(response_text: str) -> Optional[list]:
+        """从响应文本中解析JSON数组，失败时返回None"""
+        json_block_match = _JSON_ARRAY_BLOCK_RE.search(response_text)
+        if json_block_match:
+            response_text = json_block_match.group(1)
+        else:
+            start_idx = response_text.find('[')
+            end_idx = response_text.rfind(']')
+            if start_idx == -1 or end_idx <= start_idx:
+                return None
+            response_text = response_text[start_idx:end_idx + 1]
+        
+        try:
+            result = orjson.loads(response_text) if orjson is not None else json.loads(response_text)
+        except ValueError:
+            return None
+        
+        return result if isinstance(result, list) else None
+    
+    @staticmethod
+    def _normalize_filter_result(result: dict) -> dict:
+        """补全筛选结果中缺失的字段"""
+        # 验证结果格式
+        if "passed" not in result:
+            result["passed"] = False
+        if "reason" not in result:
+            result["reason"] = "无法解析筛选结果"
+        if "confidence" not in result:
+            result["confidence"] = 0.5
+        
+        return result
+    
+    @staticmethod
+    def _build_filter_prompt(criteria_description: str, question: str) -> str:
+        """构建图片筛选提示词"""
+        return """
 You are a professional image filtering and quality evaluation expert.
 
 Your task is to evaluate whether an image meets the required criteria, and to assign a quality score based on how well it satisfies both required and optional standards.
@@ -264,51 +558,13 @@ Return the result in JSON format ONLY, with no extra text:
   "reason": "Detailed explanation of which required and optional criteria are satisfied or violated, and how the score is determined",
   "confidence": float (0.0–1.0)
 }}""".format(question=question, criteria_description=criteria_description)
-        
-        try:
-            response_text = await self.analyze_image_async(image_input, prompt, temperature)
-            
-            # 解析JSON响应
-            json_block_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response_text, re.DOTALL)
-            if json_block_match:
-                response_text = json_block_match.group(1)
-            else:
-                start_idx = response_text.find('{')
-                if start_idx != -1:
-                    brace_count = 0
-                    for i in range(start_idx, len(response_text)):
-                        if response_text[i] == '{':
-                            brace_count += 1
-                        elif response_text[i] == '}':
-                            brace_count -= 1
-                            if brace_count == 0 and '"passed"' in response_text[start_idx:i+1]:
-                                response_text = response_text[start_idx:i+1]
-                                break
-            
-            result = json.loads(response_text)
-            
-            # 验证结果格式
-            if "passed" not in result:
-                result["passed"] = False
-            if "reason" not in result:
-                result["reason"] = "无法解析筛选结果"
-            if "confidence" not in result:
-                result["confidence"] = 0.5
-            
-            return result
-            
-        except Exception as e:
-            return {
-                "passed": False,
-                "reason": f"筛选过程出错: {str(e)}",
-                "confidence": 0.0
-            }
 
 
 async def process_batch_async(
     items: List[Dict[str, Any]],
     num_gpus: int = 8,
-    max_concurrent_per_gpu: int = 10
+    max_concurrent_per_gpu: int = 10,
+    images_per_request: int = 4
 ) -> List[Dict[str, Any]]:
     """
     使用多GPU异步处理批量数据
@@ -317,70 +573,84 @@ async def process_batch_async(
         items: 待处理的数据项列表
         num_gpus: GPU数量
         max_concurrent_per_gpu: 每个GPU的最大并发数
+        images_per_request: 筛选标准和问题相同的数据项，每次请求最多合并的图片数
         
     Returns:
         处理结果列表
     """
-    # 将任务分配到不同的GPU
-    tasks_per_gpu = len(items) // num_gpus
-    gpu_tasks = []
+    # 按(筛选标准, 问题)分组，同组的图片合并到一次请求中，共享提示词
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for index, item in enumerate(items):
+        key = (item.get("criteria_description", ""), item.get("question", ""))
+        groups.setdefault(key, []).append(index)
     
-    for gpu_id in range(num_gpus):
-        start_idx = gpu_id * tasks_per_gpu
-        if gpu_id == num_gpus - 1:
-            end_idx = len(items)  # 最后一个GPU处理剩余所有任务
-        else:
-            end_idx = (gpu_id + 1) * tasks_per_gpu
-        
-        gpu_tasks.append((gpu_id, items[start_idx:end_idx]))
+    # 所有GPU共享一个FIFO任务队列：空闲的worker随时领取下一个任务，
+    # 不会出现某个GPU分到大图片后拖慢整批、其他GPU却已空闲的情况
+    queue: asyncio.Queue = asyncio.Queue()
+    for (criteria_description, question), indices in groups.items():
+        for start in range(0, len(indices), images_per_request):
+            queue.put_nowait((criteria_description, question, indices[start:start + images_per_request]))
     
-    # 为每个GPU创建处理任务
-    async def process_gpu_tasks(gpu_id: int, tasks: List[Dict]):
-        """处理单个GPU的任务"""
-        results = []
-        async with AsyncGeminiClient(
-            gpu_id=gpu_id,
-            max_concurrent=max_concurrent_per_gpu
-        ) as client:
-            # 创建所有异步任务
-            async_tasks = []
-            for item in tasks:
+    # 按原始顺序保存结果
+    final_results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    
+    async def worker(client: AsyncGeminiClient):
+        """不断从队列领取任务并处理，直到被取消"""
+        while True:
+            criteria_description, question, indices = await queue.get()
+            try:
                 # 这里需要根据实际需求调用相应的异步方法
                 # 示例：假设item包含image_input, criteria_description, question
-                task = client.filter_image_async(
-                    image_input=item.get("image_input"),
-                    criteria_description=item.get("criteria_description", ""),
-                    question=item.get("question", ""),
+                results = await client.filter_images_async(
+                    image_inputs=[items[index].get("image_input") for index in indices],
+                    criteria_description=criteria_description,
+                    question=question,
                     temperature=0.3
                 )
-                async_tasks.append(task)
-            
-            # 等待所有任务完成
-            results = await asyncio.gather(*async_tasks, return_exceptions=True)
-            
-            # 处理异常结果
-            processed_results = []
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    processed_results.append({
-                        "error": str(result),
-                        "item": tasks[i]
-                    })
-                else:
-                    processed_results.append(result)
-        
-        return processed_results
+                for index, result in zip(indices, results):
+                    final_results[index] = result
+            except Exception as e:
+                # 处理异常结果
+                for index in indices:
+                    final_results[index] = {
+                        "error": str(e),
+                        "item": items[index]
+                    }
+            finally:
+                queue.task_done()
     
-    # 并发处理所有GPU的任务
-    all_results = await asyncio.gather(*[
-        process_gpu_tasks(gpu_id, tasks)
-        for gpu_id, tasks in gpu_tasks
-    ])
+    # 为每个GPU创建处理任务
+    async def process_gpu_tasks(gpu_id: int, session: aiohttp.ClientSession):
+        """为单个GPU启动max_concurrent_per_gpu个worker，直到队列处理完毕"""
+        async with AsyncGeminiClient(
+            gpu_id=gpu_id,
+            max_concurrent=max_concurrent_per_gpu,
+            session=session
+        ) as client:
+            workers = [
+                asyncio.create_task(worker(client))
+                for _ in range(max_concurrent_per_gpu)
+            ]
+            try:
+                await queue.join()
+            finally:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
     
-    # 合并结果
-    final_results = []
-    for gpu_results in all_results:
-        final_results.extend(gpu_results)
+    # 所有GPU共用一个连接池，keep-alive连接和TLS握手在GPU之间复用
+    connector = aiohttp.TCPConnector(
+        limit=num_gpus * max_concurrent_per_gpu,
+        limit_per_host=0,
+        ttl_dns_cache=300,
+        keepalive_timeout=75,
+        enable_cleanup_closed=True
+    )
+    async with create_session(connector=connector) as session:
+        # 并发处理所有GPU的任务
+        await asyncio.gather(*[
+            process_gpu_tasks(gpu_id, session)
+            for gpu_id in range(num_gpus)
+        ])
     
     return final_results
-
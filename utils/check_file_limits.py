@@ -3,12 +3,52 @@
 """
 检查系统文件描述符限制
 """
-import resource
 import os
+from typing import Optional
+
+# resource只在POSIX平台上可用（Windows没有该模块），其他平台上不调整文件描述符限制
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def ensure_file_limit(desired: int = 8192) -> Optional[int]:
+    """
+    将文件描述符软限制提高到desired（不超过硬限制），已满足时不做修改
+    
+    可重复调用。高并发时大量HTTP连接和parquet/json文件会同时占用文件描述符，
+    软限制过低会导致 'Too many open files' 错误。
+    
+    Returns:
+        生效的软限制；非POSIX平台（没有resource模块）返回None
+    """
+    if resource is None:
+        return None
+    
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    # RLIM_INFINITY（-1）表示不限，不能按数值比较，否则会被"提高"到desired
+    if soft == resource.RLIM_INFINITY or soft >= desired:
+        return soft
+    
+    target = desired if hard == resource.RLIM_INFINITY else min(desired, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+    except (ValueError, OSError) as e:
+        print(f"[WARNING] 无法提高文件描述符限制 ({soft} -> {target}): {e}")
+        return soft
+    
+    soft = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+    print(f"[INFO] 文件描述符软限制已提高: {soft} (硬限制: {hard})")
+    return soft
 
 
 def check_file_limits():
     """检查当前文件描述符限制"""
+    if resource is None:
+        print("[WARNING] 当前平台没有resource模块，无法检查文件描述符限制")
+        return
+    
     # 获取软限制和硬限制
     soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
     
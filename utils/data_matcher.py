@@ -3,51 +3,86 @@
 从重分类文件夹中读取数据,与基准parquet文件匹配,并输出JSON格式
 """
 import os
-import json
 import pyarrow as pa
 import pyarrow.parquet as pq
-from typing import Any, Dict, Optional, Tuple
-import base64
-import imghdr
+from typing import Any, Dict, Iterator, Optional, Tuple
+import binascii
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import config
+from utils.check_file_limits import ensure_file_limit
+from utils.json_io import JsonArrayWriter
+
+# pybase64为可选依赖：SIMD加速的base64编码，接口与标准库base64一致
+try:
+    import pybase64 as b64
+except ImportError:
+    import base64 as b64
+
+# 常见图片格式的魔数 -> 图片类型
+_SIGS = (
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF8', 'gif'),
+    (b'BM', 'bmp'),
+    (b'II*\x00', 'tiff'),
+    (b'MM\x00*', 'tiff'),
+    (b'RIFF', 'webp'),  # RIFF容器还需在偏移8处为WEBP，见_image_type
+)
+
+
+def _image_type(data: bytes) -> Optional[str]:
+    """根据文件头魔数识别图片类型，无法识别时返回None"""
+    for sig, img_type in _SIGS:
+        if data.startswith(sig):
+            # RIFF也用于WAV/AVI等容器，只有偏移8处为WEBP时才是图片
+            if sig == b'RIFF' and data[8:12] != b'WEBP':
+                return None
+            return img_type
+    return None
 
 
-def serialize_value(value: Any) -> Any:
-    """
-    将PyArrow值序列化为JSON可存储的格式
+def serialize_value(value: Any, skip_bytes: bool = False) -> Any:
     """
-    if value is None:
-        return None
+    将值序列化为JSON可存储的格式
+    输入为to_pylist()得到的原生Python值，只有bytes(如图像数据)需要转换为base64
     
+    skip_bytes为True时不做base64编码，bytes替换为占位 {"__elided__": 字节数}
+    """
     # 处理bytes类型(如图像数据)
-    if isinstance(value, bytes):
-        return base64.b64encode(value).decode('utf-8')
-    
-    # 处理PyArrow的binary类型
-    if isinstance(value, pa.lib.BinaryScalar):
-        return base64.b64encode(value.as_py()).decode('utf-8')
+    if isinstance(value, (bytes, bytearray)):
+        if skip_bytes:
+            return {"__elided__": len(value)}
+        return b64.b64encode(value).decode('ascii')
     
     # 处理列表
     if isinstance(value, list):
-        return [serialize_value(v) for v in value]
+        return [serialize_value(v, skip_bytes) for v in value]
     
     # 处理字典
     if isinstance(value, dict):
-        return {k: serialize_value(v) for k, v in value.items()}
-    
-    # 处理PyArrow结构体
-    if hasattr(value, 'as_py'):
-        return serialize_value(value.as_py())
+        return {k: serialize_value(v, skip_bytes) for k, v in value.items()}
     
-    # 其他类型直接返回
+    # 其他类型(包括None)直接返回
     return value
 
 
+def _bytes_look_like_image(data: bytes, min_len: int = 50) -> bool:
+    """
+    判断原始bytes是否像图片，结果与对其base64编码调用is_base64一致（无需先编码再解码）
+    """
+    if 4 * ((len(data) + 2) // 3) < min_len or len(data) < 10:
+        return False
+    return _image_type(data) is not None or len(data) > 1000
+
+
 def check_has_image(record: Dict[str, Any]) -> bool:
     """
     检查记录中是否包含图像数据
     常见的图像字段: jpg, png, images, image, img
+    
+    record可以是原始行（bytes字段）或serialize_value之后的记录（base64字符串字段）
     """
     if record is None:
         return False
@@ -59,7 +94,7 @@ def check_has_image(record: Dict[str, Any]) -> bool:
             value = record[field]
             # 检查是否为非空的bytes或binary数据
             if value is not None:
-                if isinstance(value, bytes) and len(value) > 0:
+                if isinstance(value, (bytes, bytearray)) and _bytes_look_like_image(value):
                     return True
                 if isinstance(value, str) and is_base64(value):
                     return True
@@ -69,56 +104,51 @@ def check_has_image(record: Dict[str, Any]) -> bool:
     return False
 
 
-def is_base64(s: Any, min_len: int = 50) -> bool:
+def try_decode_base64(s: Any, min_len: int = 50) -> Optional[bytes]:
     """
-    判断字符串是否可能是 Base64 编码
-    增强版本：更严格的验证
+    尝试把可能是 Base64 编码图片的字符串解码
+    返回: 解码后的字节，如果不像Base64编码的图片则返回None
     """
     if not isinstance(s, str):
-        return False
+        return None
     
     if len(s) < min_len:
-        return False
+        return None
     
-    # Base64字符检查
-    import re
-    if not re.match(r'^[A-Za-z0-9+/]*={0,2}$', s):
-        return False
+    # Base64长度必须是4的倍数，不满足时无需解码
+    if len(s) % 4 != 0:
+        return None
     
     try:
-        decoded = base64.b64decode(s, validate=True)
-        # 检查解码后的数据是否看起来像图片（检查常见图片文件头）
-        if len(decoded) < 10:
-            return False
-        
-        # 检查常见图片格式的魔数
-        image_signatures = [
-            b'\xff\xd8\xff',  # JPEG
-            b'\x89PNG\r\n\x1a\n',  # PNG
-            b'GIF87a',  # GIF
-            b'GIF89a',  # GIF
-            b'BM',  # BMP
-            b'II*\x00',  # TIFF
-            b'MM\x00*',  # TIFF
-        ]
-        
-        for sig in image_signatures:
-            if decoded.startswith(sig):
-                return True
-        
-        # 如果没有识别出魔数，但长度足够大，也认为可能是图片
-        if len(decoded) > 1000:
-            return True
-            
-        return False
-    except Exception:
-        return False
+        # strict_mode下遇到非Base64字符直接报错，校验与解码在C中一次完成
+        decoded = binascii.a2b_base64(s, strict_mode=True)
+    except (binascii.Error, ValueError):
+        return None
+    
+    # 检查解码后的数据是否看起来像图片（检查常见图片文件头）
+    if len(decoded) < 10:
+        return None
+    
+    # 检查常见图片格式的魔数
+    if _image_type(decoded) is not None:
+        return decoded
+    
+    # 如果没有识别出魔数，但长度足够大，也认为可能是图片
+    return decoded if len(decoded) > 1000 else None
+
+
+def is_base64(s: Any, min_len: int = 50) -> bool:
+    """
+    判断字符串是否可能是 Base64 编码
+    增强版本：更严格的验证
+    """
+    return try_decode_base64(s, min_len) is not None
 
 
-def find_base64_field(obj: dict) -> Optional[Tuple[str, str]]:
+def find_base64_field(obj: dict) -> Optional[Tuple[str, bytes]]:
     """
     返回对象中第一个可能的 Base64 字段
-    返回: (字段名, base64字符串) 或 None
+    返回: (字段名, 解码后的图片字节) 或 None
     """
     if not isinstance(obj, dict):
         return None
@@ -129,54 +159,44 @@ def find_base64_field(obj: dict) -> Optional[Tuple[str, str]]:
     # 先检查优先字段
     for field in priority_fields:
         if field in obj:
-            value = obj[field]
-            if isinstance(value, str) and is_base64(value):
-                return (field, value)
+            decoded = try_decode_base64(obj[field])
+            if decoded is not None:
+                return (field, decoded)
     
     # 再检查其他字段
     for k, v in obj.items():
-        if k not in priority_fields and isinstance(v, str) and is_base64(v):
-            return (k, v)
+        if k not in priority_fields:
+            decoded = try_decode_base64(v)
+            if decoded is not None:
+                return (k, decoded)
     
     return None
 
 
-def save_base64_image(img_b64: str, save_dir: str, prefix: str, index: int, 
+def save_base64_image(img_bytes: bytes, save_dir: str, prefix: str, index: int, 
                       parquet_name: str = None, sid: Any = None) -> Optional[str]:
     """
-    将 Base64 编码保存为图片
+    将（已从 Base64 解码的）图片字节保存为图片
     自动检测图片类型
     返回图片路径
     
     Args:
-        img_b64: Base64编码的图片
+        img_bytes: 图片字节（由find_base64_field解码得到）
         save_dir: 保存目录
         prefix: 前缀 (a/b)
         index: 样本索引
         parquet_name: parquet文件名（用于区分不同文件）
         sid: 样本ID（用于唯一标识）
     """
-    try:
-        img_bytes = base64.b64decode(img_b64)
-    except Exception as e:
-        print(f"[ERROR] Base64 decode failed for {prefix}[{index}]: {e}")
-        return None
-
     if len(img_bytes) == 0:
         print(f"[ERROR] Decoded image is empty for {prefix}[{index}]")
         return None
 
-    # 自动检测图片类型
-    img_type = imghdr.what(None, h=img_bytes)
+    # 根据文件头魔数检测图片类型
+    img_type = _image_type(img_bytes)
     if img_type is None:
-        # 如果无法检测类型，尝试从常见格式推断
-        if img_bytes.startswith(b'\xff\xd8\xff'):
-            img_type = 'jpeg'
-        elif img_bytes.startswith(b'\x89PNG'):
-            img_type = 'png'
-        else:
-            print(f"[WARNING] Cannot detect image type for {prefix}[{index}], defaulting to jpg")
-            img_type = 'jpg'
+        print(f"[WARNING] Cannot detect image type for {prefix}[{index}], defaulting to jpg")
+        img_type = 'jpg'
 
     # 构建唯一的图片文件名
     # 格式: {parquet_name}_{sid}_{prefix}.{img_type}
@@ -209,22 +229,44 @@ def collect_category_dirs(root_dir):
         print(f"[WARNING] Root directory does not exist: {root_dir}")
         return categories
     
-    for category in os.listdir(root_dir):
-        cat_path = os.path.join(root_dir, category)
-        if not os.path.isdir(cat_path):
-            continue
-        
-        for l2category in os.listdir(cat_path):
-            l2cat_path = os.path.join(cat_path, l2category)
-            if not os.path.isdir(l2cat_path):
+    # 使用os.scandir，DirEntry.is_dir()复用目录遍历时得到的类型信息，无需逐项stat
+    with os.scandir(root_dir) as cat_entries:
+        for cat_entry in cat_entries:
+            if not cat_entry.is_dir():
                 continue
             
-            categories.append((category, l2category, l2cat_path))
+            with os.scandir(cat_entry.path) as l2cat_entries:
+                for l2cat_entry in l2cat_entries:
+                    if not l2cat_entry.is_dir():
+                        continue
+                    
+                    categories.append((cat_entry.name, l2cat_entry.name, l2cat_entry.path))
     
     return categories
 
 
-def load_benchmark_data(benchmark_file: str) -> Dict[int, Dict[str, Any]]:
+class BenchmarkIndex:
+    """
+    基准数据索引：数据保留在Arrow表中，只建立 index -> 行号 的映射，
+    按需物化单行，避免整表转换为Python字典带来的内存开销
+    """
+
+    def __init__(self, table: "pa.Table"):
+        self.table = table
+        self.idx_to_row = dict(zip(table.column('index').to_pylist(), range(table.num_rows)))
+
+    def __len__(self) -> int:
+        return len(self.idx_to_row)
+
+    def get_record(self, sid: Any) -> Optional[Dict[str, Any]]:
+        """按index取出一行记录，不存在时返回None"""
+        row = self.idx_to_row.get(sid)
+        if row is None:
+            return None
+        return self.table.slice(row, 1).to_pylist()[0]
+
+
+def load_benchmark_data(benchmark_file: str) -> BenchmarkIndex:
     """
     加载基准文件,以index为key建立索引
     """
@@ -238,38 +280,63 @@ def load_benchmark_data(benchmark_file: str) -> Dict[int, Dict[str, Any]]:
     if 'index' not in table.schema.names:
         raise ValueError("Benchmark file must have 'index' column")
     
-    # 转换为字典,以index为key
-    benchmark_dict = {}
+    benchmark = BenchmarkIndex(table)
     
-    for i in range(table.num_rows):
-        row_dict = {}
-        for col_name in table.schema.names:
-            row_dict[col_name] = table[col_name][i].as_py()
-        
-        index_value = row_dict['index']
-        benchmark_dict[index_value] = row_dict
+    print(f"[INFO] Loaded {len(benchmark)} records from benchmark")
+    return benchmark
+
+
+def iter_parquet_rows(
+    parquet_file: pq.ParquetFile,
+    max_rows: Optional[int] = None,
+    batch_size: int = 512
+) -> Iterator[Dict[str, Any]]:
+    """
+    按RecordBatch流式读取parquet文件，逐行返回原生Python字典
+    峰值内存只与batch_size相关，而不是整个文件大小
     
-    print(f"[INFO] Loaded {len(benchmark_dict)} records from benchmark")
-    return benchmark_dict
+    Args:
+        parquet_file: 已打开的ParquetFile
+        max_rows: 最多返回的行数，None表示全部
+        batch_size: 每批读取的行数
+    """
+    if max_rows is not None:
+        batch_size = max(1, min(batch_size, max_rows))
+    
+    remaining = max_rows
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        if remaining is not None:
+            if remaining <= 0:
+                return
+            if batch.num_rows > remaining:
+                batch = batch.slice(0, remaining)
+            remaining -= batch.num_rows
+        
+        # to_pylist()一次转换整批，避免逐单元格调用as_py()
+        yield from batch.to_pylist()
 
 
 def process_category(
     category: str,
     l2category: str,
     cat_path: str,
-    benchmark_dict: Dict[int, Dict[str, Any]],
+    benchmark: BenchmarkIndex,
     output_dir: str,
     test_mode: bool = False,
-    test_samples: int = 5
+    test_samples: int = 5,
+    keep_images: bool = True
 ):
     """
     处理单个类别目录
+    
+    keep_images为False且不保存图片文件时，输出JSON中省略图片数据（不做base64编码）
     """
-    parquet_files = [
-        os.path.join(cat_path, f)
-        for f in os.listdir(cat_path)
-        if f.endswith(".parquet")
-    ]
+    with os.scandir(cat_path) as entries:
+        parquet_files = [
+            entry.path
+            for entry in entries
+            if entry.name.endswith(".parquet")
+        ]
 
     if not parquet_files:
         print(f"[WARNING] 未找到parquet文件: {cat_path}")
@@ -277,119 +344,165 @@ def process_category(
 
     # 临时图片输出目录（不保存临时图片文件，节省磁盘空间）
     temp_img_dir = None
+    skip_bytes = temp_img_dir is None and not keep_images
 
     for pq_idx, pq_file in enumerate(parquet_files, 1):
         parquet_name = os.path.splitext(os.path.basename(pq_file))[0]
         print(f"[INFO] 处理文件 [{pq_idx}/{len(parquet_files)}]: {parquet_name}")
 
         try:
-            table = pq.read_table(pq_file)
+            parquet_file = pq.ParquetFile(pq_file)
         except Exception as e:
             print(f"[ERROR] Failed to read {pq_file}: {e}")
             continue
 
-        if 'id' not in table.schema.names:
+        if 'id' not in parquet_file.schema_arrow.names:
             print(f"[WARNING] No 'id' column in {pq_file}, skipping")
             continue
 
-        total_rows = table.num_rows
-        if test_mode:
-            process_rows = min(test_samples, total_rows)
-            table = table.slice(0, process_rows)
-        else:
-            process_rows = total_rows
-
-        matched_results = []
         sample_index = 0
         matched_count = 0
         unmatched_count = 0
 
-        for i in range(table.num_rows):
-            # 构造 source_a
-            source_a = {
-                col_name: serialize_value(table[col_name][i].as_py())
-                for col_name in table.schema.names
-            }
-
-            sid = source_a.get('id')
-
-            # ==== 处理 source_a 图片 ====
-            # 如果不需要保存图片文件，跳过图片保存步骤
-            # 图片数据已经在source_a的base64字段中，后续处理可以直接使用
-            if temp_img_dir:
-                try:
-                    result = find_base64_field(source_a)
-                    if result:
-                        field_name, img_b64 = result
-                        img_path = save_base64_image(
-                            img_b64=img_b64,
-                            save_dir=temp_img_dir,
-                            prefix="a",
-                            index=sample_index,
-                            parquet_name=parquet_name,
-                            sid=sid
-                        )
-                        if img_path:
-                            source_a["image_path"] = img_path
-                except Exception:
-                    pass  # 静默处理错误
-
-            # 查找匹配的基准数据
-            record_b = benchmark_dict.get(sid)
-            source_b = None
-
-            if record_b:
-                source_b = {k: serialize_value(v) for k, v in record_b.items()}
-
-                # ==== 处理 source_b 图片 ====
-                # 如果不需要保存图片文件，只保留image_path字段指向base64数据
+        # 流式读取（测试模式下只读取前test_samples行）
+        rows = iter_parquet_rows(parquet_file, max_rows=test_samples if test_mode else None)
+
+        # 输出 JSON（逐条写入，内存中只保留当前一条记录）
+        output_subdir = os.path.join(output_dir, category, l2category)
+        os.makedirs(output_subdir, exist_ok=True)
+        filename = f"{parquet_name}_test.json" if test_mode else f"{parquet_name}.json"
+        output_file = os.path.join(output_subdir, filename)
+
+        try:
+            writer = JsonArrayWriter(output_file, pretty=True)
+        except Exception as e:
+            print(f"[ERROR] Failed to write JSON to disk: {e}")
+            continue
+
+        try:
+            for row in rows:
+                # 构造 source_a
+                source_a = {col_name: serialize_value(value, skip_bytes) for col_name, value in row.items()}
+
+                sid = source_a.get('id')
+
+                # ==== 处理 source_a 图片 ====
+                # 如果不需要保存图片文件，跳过图片保存步骤
+                # 图片数据已经在source_a的base64字段中，后续处理可以直接使用
                 if temp_img_dir:
                     try:
-                        result = find_base64_field(source_b)
+                        result = find_base64_field(source_a)
                         if result:
-                            field_name, img_b64 = result
+                            field_name, img_bytes = result
                             img_path = save_base64_image(
-                                img_b64=img_b64,
+                                img_bytes=img_bytes,
                                 save_dir=temp_img_dir,
-                                prefix="b",
+                                prefix="a",
                                 index=sample_index,
                                 parquet_name=parquet_name,
                                 sid=sid
                             )
                             if img_path:
-                                source_b["image_path"] = img_path
+                                source_a["image_path"] = img_path
                     except Exception:
                         pass  # 静默处理错误
 
-                matched_count += 1
-            else:
-                unmatched_count += 1
+                # 查找匹配的基准数据
+                record_b = benchmark.get_record(sid)
+                source_b = None
+
+                if record_b:
+                    source_b = {k: serialize_value(v, skip_bytes) for k, v in record_b.items()}
+
+                    # ==== 处理 source_b 图片 ====
+                    # 如果不需要保存图片文件，只保留image_path字段指向base64数据
+                    if temp_img_dir:
+                        try:
+                            result = find_base64_field(source_b)
+                            if result:
+                                field_name, img_bytes = result
+                                img_path = save_base64_image(
+                                    img_bytes=img_bytes,
+                                    save_dir=temp_img_dir,
+                                    prefix="b",
+                                    index=sample_index,
+                                    parquet_name=parquet_name,
+                                    sid=sid
+                                )
+                                if img_path:
+                                    source_b["image_path"] = img_path
+                        except Exception:
+                            pass  # 静默处理错误
+
+                    matched_count += 1
+                else:
+                    unmatched_count += 1
+
+                result = {
+                    "sample_index": sample_index,
+                    "id": sid,
+                    "source_a": source_a,
+                    "source_b": source_b,
+                    # 按原始行判断，不受skip_bytes省略图片数据的影响
+                    "has_image_a": check_has_image(row),
+                    "has_image_b": check_has_image(record_b) if source_b else False
+                }
+
+                writer.write(result)
+                sample_index += 1
+        except Exception as e:
+            # 读取/解码中途出错时只跳过当前文件，继续处理类别中的其余parquet文件；
+            # 关闭时仍会补全数组结尾，已写出的记录是完整的JSON数组
+            print(f"[ERROR] Failed to read {pq_file} after {sample_index} rows: {e}")
+            continue
+        finally:
+            writer.close()
 
-            result = {
-                "sample_index": sample_index,
-                "id": sid,
-                "source_a": source_a,
-                "source_b": source_b,
-                "has_image_a": check_has_image(source_a),
-                "has_image_b": check_has_image(source_b) if source_b else False
-            }
+        print(f"[INFO] 已保存 {sample_index} 条记录 (匹配: {matched_count}, 未匹配: {unmatched_count})")
 
-            matched_results.append(result)
-            sample_index += 1
 
-        # 输出 JSON
-        output_subdir = os.path.join(output_dir, category, l2category)
-        os.makedirs(output_subdir, exist_ok=True)
-        parquet_name = os.path.splitext(os.path.basename(pq_file))[0]
-        filename = f"{parquet_name}_test.json" if test_mode else f"{parquet_name}.json"
-        output_file = os.path.join(output_subdir, filename)
+# 进程池worker共享的基准数据，由_init_worker在每个worker启动时设置一次
+_WORKER_BENCHMARK: Optional[BenchmarkIndex] = None
 
-        try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(matched_results, f, ensure_ascii=False, indent=2)
-            print(f"[INFO] 已保存 {len(matched_results)} 条记录 (匹配: {matched_count}, 未匹配: {unmatched_count})")
-        except Exception as e:
-            print(f"[ERROR] Failed to write JSON to disk: {e}")
+# 未指定num_workers时的默认进程数上限
+_DEFAULT_MAX_WORKERS = 8
+
+
+def _write_benchmark_ipc(benchmark: BenchmarkIndex, ipc_file: str) -> None:
+    """把基准表写成Arrow IPC文件，供worker以内存映射方式共享"""
+    with pa.OSFile(ipc_file, 'wb') as sink:
+        with pa.ipc.new_file(sink, benchmark.table.schema) as writer:
+            writer.write_table(benchmark.table)
+
+
+def _init_worker(benchmark_ipc_file: str):
+    """
+    进程池initializer：以内存映射方式打开基准表的Arrow IPC文件
+    
+    表数据不经pickle复制到每个worker，各进程共享操作系统页缓存中的同一份数据
+    """
+    global _WORKER_BENCHMARK
+    table = pa.ipc.open_file(pa.memory_map(benchmark_ipc_file, 'r')).read_all()
+    _WORKER_BENCHMARK = BenchmarkIndex(table)
+
+
+def _process_one(task: Tuple) -> None:
+    """处理单个类别（进程池任务），失败时只打印错误不中断其他类别"""
+    idx, total, category, l2category, cat_path, output_dir, test_mode, test_samples, keep_images = task
+    try:
+        print(f"[INFO] [{idx}/{total}] 处理类别: {category}/{l2category}")
+        process_category(
+            category,
+            l2category,
+            cat_path,
+            _WORKER_BENCHMARK,
+            output_dir,
+            test_mode=test_mode,
+            test_samples=test_samples,
+            keep_images=keep_images
+        )
+    except Exception as e:
+        print(f"[ERROR] 处理失败 {category}/{l2category}: {e}")
 
 
 def match_data(
@@ -399,7 +512,9 @@ def match_data(
     target_categories: Optional[list] = None,
     test_mode: bool = False,
     test_samples: int = 5,
-    test_max_categories: int = 2
+    test_max_categories: int = 2,
+    num_workers: Optional[int] = None,
+    keep_images: Optional[bool] = None
 ) -> str:
     """
     数据匹配主函数
@@ -412,6 +527,8 @@ def match_data(
         test_mode: 是否启用测试模式
         test_samples: 测试模式下每个类别处理的样本数
         test_max_categories: 测试模式下最多处理的类别数
+        num_workers: 并行处理类别的进程数，默认为CPU核数（最多8个），<=1时顺序处理
+        keep_images: 是否在输出JSON中保留base64图片数据，默认读取config.MATCH_KEEP_IMAGES
         
     Returns:
         输出目录路径
@@ -420,9 +537,15 @@ def match_data(
     recat_root = recat_root or config.RECAT_ROOT
     benchmark_file = benchmark_file or config.BENCHMARK_FILE
     output_dir = output_dir or config.MATCH_OUTPUT_DIR
+    keep_images = config.MATCH_KEEP_IMAGES if keep_images is None else keep_images
     
     os.makedirs(output_dir, exist_ok=True)
     
+    # 并行处理时会同时打开大量parquet/json文件
+    file_limit = ensure_file_limit()
+    if file_limit is not None:
+        print(f"[INFO] 文件描述符软限制: {file_limit}")
+    
     # 显示运行模式（简化输出）
     if test_mode:
         print(f"[INFO] 测试模式: 每类别 {test_samples} 个样本，最多 {test_max_categories} 个类别")
@@ -430,7 +553,7 @@ def match_data(
         print(f"[INFO] 生产模式: 处理所有数据")
     
     # 加载基准数据
-    benchmark_dict = load_benchmark_data(benchmark_file)
+    benchmark = load_benchmark_data(benchmark_file)
     
     # 收集所有类别
     all_categories = collect_category_dirs(recat_root)
@@ -454,22 +577,30 @@ def match_data(
     
     print(f"\n[INFO] Will process {len(categories_to_process)} categories")
     
-    # 处理每个类别
-    for idx, (category, l2category, cat_path) in enumerate(categories_to_process, 1):
-        try:
-            print(f"[INFO] [{idx}/{len(categories_to_process)}] 处理类别: {category}/{l2category}")
-            process_category(
-                category, 
-                l2category, 
-                cat_path, 
-                benchmark_dict, 
-                output_dir,
-                test_mode=test_mode,
-                test_samples=test_samples
-            )
-        except Exception as e:
-            print(f"[ERROR] 处理失败 {category}/{l2category}: {e}")
-            continue
+    # 处理每个类别：各类别互不依赖，CPU密集的解码/序列化交给进程池并行
+    total = len(categories_to_process)
+    tasks = [
+        (idx, total, category, l2category, cat_path, output_dir, test_mode, test_samples, keep_images)
+        for idx, (category, l2category, cat_path) in enumerate(categories_to_process, 1)
+    ]
+    max_workers = min(num_workers or min(os.cpu_count() or 1, _DEFAULT_MAX_WORKERS), total)
+    if max_workers <= 1:
+        global _WORKER_BENCHMARK
+        _WORKER_BENCHMARK = benchmark
+        for task in tasks:
+            _process_one(task)
+    else:
+        # 基准表写成Arrow IPC文件，worker通过内存映射共享，不随进程数成倍占用内存
+        with tempfile.TemporaryDirectory(prefix="benchmark_", dir=config.CACHE_DIR) as tmp_dir:
+            ipc_file = os.path.join(tmp_dir, "benchmark.arrow")
+            _write_benchmark_ipc(benchmark, ipc_file)
+            benchmark = None  # 主进程不再需要内存中的表
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_worker,
+                initargs=(ipc_file,)
+            ) as ex:
+                list(ex.map(_process_one, tasks))
     
     print(f"\n[INFO] 处理完成！输出目录: {output_dir}")
     
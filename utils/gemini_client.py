@@ -488,16 +488,63 @@
 
 
 
+import asyncio
 import io
-import base64
 import re
+import functools
+import importlib.util
+import hashlib
+import os
+import tempfile
+import threading
+import time
 import json
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Union, Optional, Dict, Any
-from datetime import datetime
+from typing import Union, Optional, Dict, Any, List
 from PIL import Image
 import config
 
+# pybase64为可选依赖：SIMD加速的base64编解码，接口与标准库base64一致
+try:
+    import pybase64 as b64
+except ImportError:
+    import base64 as b64
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# simplejpeg为可选依赖：直接调用libjpeg-turbo的SIMD路径编码JPEG，比PIL快数倍
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+# OpenCV为可选依赖：simplejpeg不可用时用cv2.imencode编码JPEG，两者都不可用时回退到PIL
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# httpx为可选依赖：为API请求提供共享的keep-alive连接池；安装h2时启用HTTP/2
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# 服务端不支持Batch接口时常见的报错（接口不存在/请求不被接受），用于回退为逐张筛选
+try:
+    import openai
+    _BATCH_UNSUPPORTED_ERRORS = (AttributeError, openai.NotFoundError, openai.BadRequestError)
+except ImportError:
+    _BATCH_UNSUPPORTED_ERRORS = (AttributeError,)
+
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
 # 自动安装 redeuler（如果未安装）
 try:
     from redeuler.client.openai import LBOpenAIClient
@@ -509,9 +556,107 @@ except ImportError:
     print("安装完成！")
     from redeuler.client.openai import LBOpenAIClient
 
+logger = logging.getLogger(__name__)
+
+# 设置环境变量 GEMINI_DEBUG=1 时打印每次API调用的详细调试信息
+_DEBUG = os.environ.get("GEMINI_DEBUG") == "1"
+
+# 预编译的正则表达式（每次图片检测/加载/调试保存都会用到）
+_NONWORD_RE = re.compile(r'[^\w\s-]')
+_WS_MULTI_RE = re.compile(r'\s+')
+_JSON_BLOCK_RE = re.compile(r'```(?:json)?\s*(\{.*?\})\s*```', re.DOTALL)
+_BRACE_RE = re.compile(r'[{}]')
+_BASE64_PREFIX_RE = re.compile(r'[A-Za-z0-9+/=\s]+')
+
+# 复用的JSON解码器（用raw_decode从响应文本中截取第一个JSON对象）
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _balanced_brace_end(text: str, start: int) -> int:
+    """
+    返回从start处的'{'开始、括号配平处的结束下标（不含），未配平（如输出被截断）时返回-1
+    
+    只按字符计数，不区分字符串内的括号
+    """
+    depth = 0
+    for match in _BRACE_RE.finditer(text, start):
+        depth += 1 if match.group() == '{' else -1
+        if depth == 0:
+            return match.end()
+    return -1
+
+
+def _outer_json_spans(text: str) -> List[str]:
+    """按顺序返回文本中最外层的'{...}'片段；未配平的片段取到最后一个'}'为止，且之后不再有片段"""
+    spans = []
+    start_idx = text.find('{')
+    while start_idx != -1:
+        end_idx = _balanced_brace_end(text, start_idx)
+        if end_idx == -1:
+            last = text.rfind('}')
+            if last > start_idx:
+                spans.append(text[start_idx:last + 1])
+            break
+        spans.append(text[start_idx:end_idx])
+        start_idx = text.find('{', end_idx)
+    return spans
+
+# base64中允许出现的空白字符，以及用于str.translate删除这些字符的映射表
+_WS_CHARS = ' \t\n\r\v\f'
+_WS_TABLE = str.maketrans('', '', _WS_CHARS)
+
+# 常见图片格式的文件头魔数
+_IMAGE_MAGICS = (b'\xff\xd8\xff', b'\x89PNG', b'GIF8', b'RIFF')
+
+# 线程本地的JPEG编码缓冲区（PIL回退路径复用，避免每次编码重新分配和扩容）
+_TLS = threading.local()
+
+
+@functools.lru_cache(maxsize=1024)
+def _classify_str(image_str: str) -> Optional[str]:
+    """检测字符串/路径形式的图片输入类型，无法识别时返回None（同一路径/URL经常重复出现，结果按字符串缓存）"""
+    # 检测URL
+    if image_str.startswith(('http://', 'https://')):
+        return 'url'
+    
+    # 检测base64 data URI
+    if image_str.startswith('data:image'):
+        return 'base64'
+    
+    # 检测纯base64字符串（对长字符串进行启发式判断）
+    # 只检查前缀字符集和文件头魔数，不对整个字符串做完整解码
+    if len(image_str) > 100 and _BASE64_PREFIX_RE.fullmatch(image_str, 0, 256):
+        try:
+            if b64.b64decode(image_str[:16]).startswith(_IMAGE_MAGICS):
+                return 'base64'
+        except Exception:
+            pass
+        
+        ws_count = sum(image_str.count(c) for c in _WS_CHARS)
+        if (len(image_str) - ws_count) % 4 == 0:
+            return 'base64'
+    
+    # 检测文件路径（限制长度避免错误）
+    if len(image_str) < 500:
+        # os.path.exists内部已处理OSError/ValueError，不会抛出异常
+        if os.path.exists(image_str):
+            return 'path'
+        
+        # 如果包含路径分隔符，可能是路径
+        if '/' in image_str or '\\' in image_str or '.' in image_str:
+            return 'path'
+
+    return None
+
 
 class GeminiClient:
-    """Gemini API客户端封装（使用OpenAI兼容格式）"""
+    """
+    Gemini API客户端封装（使用OpenAI兼容格式）
+    
+    实例可在多个线程间共享复用（底层HTTP连接池是线程安全的）
+    """
+    
+    _ENCODE_CACHE_SIZE = 64  # 编码缓存最多保留的图片数
     
     def __init__(
         self, 
@@ -520,7 +665,8 @@ class GeminiClient:
         api_key: Optional[str] = None, 
         model_name: Optional[str] = None, 
         save_debug_images: bool = True, 
-        debug_image_dir: str = "/home/zhuxuzhou/test_localization/object_localization/data/view_import_img/"
+        debug_image_dir: str = "/home/zhuxuzhou/test_localization/object_localization/data/view_import_img/",
+        max_dim: Optional[int] = 1568
     ):
         """
         初始化Gemini客户端（使用LBOpenAIClient）
@@ -532,6 +678,7 @@ class GeminiClient:
             model_name: 模型名称，如果为None则从config读取
             save_debug_images: 是否保存调试图片
             debug_image_dir: 调试图片保存目录
+            max_dim: 发送前图片最长边的上限（像素），超过时等比缩小；为None时不缩放
         """
         self.service_name = service_name or getattr(config, 'SERVICE_NAME', None)
         self.env = env or getattr(config, 'ENV', 'prod')
@@ -539,7 +686,13 @@ class GeminiClient:
         self.model_name = model_name or config.MODEL_NAME
         self.save_debug_images = save_debug_images
         self.debug_image_dir = Path(debug_image_dir)
+        self.max_dim = max_dim
         self.debug_image_counter = 0
+        self._counter_lock = threading.Lock()  # 多线程调用时保护调试图片计数器
+        
+        # 图片编码结果的LRU缓存（同一张图片常以不同筛选标准多次发送）
+        self._encode_cache: "OrderedDict[tuple, str]" = OrderedDict()
+        self._encode_cache_lock = threading.Lock()
         
         # 验证必需参数
         if not self.service_name:
@@ -552,13 +705,48 @@ class GeminiClient:
             self.debug_image_dir.mkdir(parents=True, exist_ok=True)
             print(f"调试模式已开启，图片将保存到: {self.debug_image_dir}")
         
+        # API请求使用的持久HTTP客户端（keep-alive连接池，安装h2时启用HTTP/2），
+        # 所有请求共享，TCP/TLS握手只在建连时发生一次
+        self._api_http = None
+        if httpx is not None:
+            self._api_http = httpx.Client(
+                http2=_HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(300.0, connect=10.0),
+                limits=httpx.Limits(max_connections=64, max_keepalive_connections=32)
+            )
+        
         # 初始化LBOpenAIClient
-        self.client = LBOpenAIClient(
+        client_kwargs = dict(
             service_name=self.service_name,
             env=self.env,
             api_key=self.api_key
         )
+        try:
+            if self._api_http is None:
+                raise TypeError("httpx不可用")
+            self.client = LBOpenAIClient(http_client=self._api_http, **client_kwargs)
+        except TypeError:
+            # LBOpenAIClient不支持传入http_client时使用其默认HTTP客户端
+            if self._api_http is not None:
+                self._api_http.close()
+                self._api_http = None
+            self.client = LBOpenAIClient(**client_kwargs)
         self._closed = False
+        
+        # URL图片下载使用的持久HTTP会话（首次下载时创建，复用TCP/TLS连接）
+        self._http = None
+    
+    def _get_http_session(self):
+        """获取用于下载URL图片的requests.Session（懒加载）"""
+        if self._http is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._http = session
+        return self._http
     
     def _detect_image_type(self, image_input: Union[str, Path, bytes, Image.Image]) -> str:
         """检测图片输入类型"""
@@ -570,35 +758,11 @@ class GeminiClient:
         
         if isinstance(image_input, (str, Path)):
             image_str = str(image_input)
-            
-            # 检测URL
-            if image_str.startswith(('http://', 'https://')):
-                return 'url'
-            
-            # 检测base64 data URI
-            if image_str.startswith('data:image'):
-                return 'base64'
-            
-            # 检测纯base64字符串（对长字符串进行启发式判断）
-            if len(image_str) > 100:
-                try:
-                    clean_str = re.sub(r'\s', '', image_str)
-                    base64.b64decode(clean_str)
-                    return 'base64'
-                except Exception:
-                    pass
-            
-            # 检测文件路径（限制长度避免错误）
-            if len(image_str) < 500:
-                try:
-                    if Path(image_str).exists():
-                        return 'path'
-                except OSError:
-                    pass
-                
-                # 如果包含路径分隔符，可能是路径
-                if '/' in image_str or '\\' in image_str or '.' in image_str:
-                    return 'path'
+            # 只缓存短字符串（路径/URL），长base64字符串不进缓存，避免缓存持有大对象
+            classify = _classify_str if len(image_str) < 500 else _classify_str.__wrapped__
+            input_type = classify(image_str)
+            if input_type:
+                return input_type
         
         raise ValueError(f"无法识别的图片输入类型: {type(image_input)}")
     
@@ -614,18 +778,17 @@ class GeminiClient:
             return Image.open(io.BytesIO(image_input))
         
         elif input_type == 'path':
-            # 对于文件路径，需要确保文件句柄被正确关闭
-            # 使用with语句确保文件在使用后立即关闭
-            with open(image_input, 'rb') as f:
-                image_bytes = f.read()
-            return Image.open(io.BytesIO(image_bytes))
+            # 直接从文件打开，不先把整个文件读入内存；
+            # load()解码像素后PIL会关闭文件句柄，不会泄漏文件描述符
+            img = Image.open(image_input)
+            img.load()
+            return img
         
         elif input_type == 'url':
-            import requests
-            response = requests.get(str(image_input))
-            response.raise_for_status()
-            # 立即关闭响应，释放连接
+            response = self._get_http_session().get(str(image_input), stream=True, timeout=(3, 10))
+            # 读取完毕后关闭响应，连接归还给连接池
             try:
+                response.raise_for_status()
                 return Image.open(io.BytesIO(response.content))
             finally:
                 response.close()
@@ -639,9 +802,8 @@ class GeminiClient:
             else:
                 base64_data = image_str
             
-            # 移除空白字符并解码
-            base64_data = re.sub(r'\s', '', base64_data)
-            image_bytes = base64.b64decode(base64_data)
+            # 移除空白字符并解码（str.translate在C中完成过滤，比正则替换快）
+            image_bytes = b64.b64decode(base64_data.translate(_WS_TABLE))
             return Image.open(io.BytesIO(image_bytes))
         
         else:
@@ -656,6 +818,16 @@ class GeminiClient:
         if self._closed:
             return
         
+        # 关闭URL图片下载会话和API请求的HTTP客户端
+        for attr in ('_http', '_api_http'):
+            http = getattr(self, attr, None)
+            if http is not None:
+                try:
+                    http.close()
+                except Exception:
+                    pass
+                setattr(self, attr, None)
+        
         try:
             # 尝试关闭LBOpenAIClient（如果支持）
             if hasattr(self.client, 'close'):
@@ -695,68 +867,179 @@ class GeminiClient:
         """将图片转换为RGB模式"""
         if image.mode == 'RGBA':
             rgb_image = Image.new('RGB', image.size, (255, 255, 255))
-            rgb_image.paste(image, mask=image.split()[3])
+            rgb_image.paste(image, mask=image.getchannel('A'))
             return rgb_image
         elif image.mode not in ('RGB', 'L'):
             return image.convert('RGB')
         return image
     
-    def _save_debug_image(self, image: Image.Image, context: str = "") -> str:
-        """保存调试图片"""
+    def _save_debug_image(
+        self,
+        image: Optional[Image.Image],
+        context: str = "",
+        already_rgb: bool = False,
+        jpeg_bytes: Optional[bytes] = None
+    ) -> str:
+        """
+        保存调试图片
+        
+        already_rgb为True时表示image已转换为RGB，不再重复转换；
+        传入jpeg_bytes时直接写入这些已编码的字节，不再重新编码
+        """
         if not self.save_debug_images:
             return ""
         
         try:
-            self.debug_image_counter += 1
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            with self._counter_lock:
+                self.debug_image_counter += 1
+                counter = self.debug_image_counter
+            timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime())
             
             # 清理上下文信息
-            clean_context = re.sub(r'[^\w\s-]', '', context)[:50]
-            clean_context = re.sub(r'\s+', '_', clean_context)
+            clean_context = _NONWORD_RE.sub('', context)[:50]
+            clean_context = _WS_MULTI_RE.sub('_', clean_context)
             
-            filename = f"{self.debug_image_counter:04d}_{timestamp}"
+            filename = f"{counter:04d}_{timestamp}"
             if clean_context:
                 filename += f"_{clean_context}"
             filename += ".jpg"
             
             filepath = self.debug_image_dir / filename
             
-            # 转换为RGB并保存
-            rgb_image = self._convert_to_rgb(image)
-            rgb_image.save(filepath, format='JPEG', quality=95)
+            if jpeg_bytes is not None:
+                filepath.write_bytes(jpeg_bytes)
+            else:
+                # 转换为RGB并保存
+                rgb_image = image if already_rgb else self._convert_to_rgb(image)
+                rgb_image.save(filepath, format='JPEG', quality=95)
             print(f"[DEBUG] 图片已保存: {filepath}")
             return str(filepath)
         except Exception as e:
             print(f"[DEBUG] 保存图片失败: {e}")
             return ""
     
+    def _encode_jpeg(self, image: Image.Image) -> bytes:
+        """将RGB/L模式图片编码为JPEG字节（依次尝试simplejpeg、cv2，都不可用时回退到PIL）"""
+        if simplejpeg is not None and np is not None:
+            arr = np.asarray(image)
+            if image.mode == 'L':
+                return simplejpeg.encode_jpeg(arr[:, :, None], quality=85, colorspace='GRAY', fastdct=True)
+            return simplejpeg.encode_jpeg(arr, quality=85, colorspace='RGB', fastdct=True)
+        
+        if cv2 is not None and np is not None:
+            arr = np.asarray(image)
+            if image.mode == 'RGB':
+                arr = cv2.cvtColor(arr, cv2.COLOR_RGB2BGR)
+            ok, buf = cv2.imencode('.jpg', arr, [cv2.IMWRITE_JPEG_QUALITY, 85])
+            if ok:
+                return buf.tobytes()
+        
+        buffer = getattr(_TLS, 'jpeg_buffer', None)
+        if buffer is None:
+            buffer = _TLS.jpeg_buffer = io.BytesIO()
+        # 只回到开头覆盖写入，不truncate（truncate会释放已分配的空间）
+        buffer.seek(0)
+        # 显式指定编码参数：optimize/progressive会额外增加编码耗时，4:2:0色度抽样减少DCT计算量和输出大小
+        image.save(buffer, format='JPEG', quality=85, optimize=False, progressive=False, subsampling=2)
+        size = buffer.tell()
+        with buffer.getbuffer() as view:
+            return bytes(view[:size])
+    
     def _encode_image(self, image_input: Union[str, Path, bytes, Image.Image], context: str = "") -> str:
-        """将图片编码为base64字符串"""
+        """将图片编码为base64字符串（路径和bytes输入的结果会被缓存）"""
+        cache_key = self._encode_cache_key(image_input)
+        if cache_key is not None:
+            with self._encode_cache_lock:
+                cached = self._encode_cache.get(cache_key)
+                if cached is not None:
+                    self._encode_cache.move_to_end(cache_key)
+            if cached is not None:
+                # 命中缓存时同样保存调试图片，直接写入缓存中那份发送给模型的JPEG字节
+                if self.save_debug_images:
+                    self._save_debug_image(None, context, jpeg_bytes=b64.b64decode(cached))
+                return cached
+        
+        encoded = self._encode_image_uncached(image_input, context)
+        
+        if cache_key is not None:
+            with self._encode_cache_lock:
+                self._encode_cache[cache_key] = encoded
+                if len(self._encode_cache) > self._ENCODE_CACHE_SIZE:
+                    self._encode_cache.popitem(last=False)
+        return encoded
+    
+    def _encode_cache_key(self, image_input: Union[str, Path, bytes, Image.Image]) -> Optional[tuple]:
+        """
+        计算编码缓存的key：文件路径用(路径, 修改时间, 大小)，bytes用内容哈希；
+        其他输入（PIL对象、URL、base64字符串）不缓存，返回None
+        """
+        if isinstance(image_input, bytes):
+            return ('bytes', hashlib.blake2b(image_input, digest_size=16).digest())
+        
+        if isinstance(image_input, (str, Path)) and self._detect_image_type(image_input) == 'path':
+            path = str(image_input)
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+            return ('path', path, st.st_mtime_ns, st.st_size)
+        
+        return None
+    
+    def _encode_image_uncached(self, image_input: Union[str, Path, bytes, Image.Image], context: str = "") -> str:
+        """加载图片并编码为base64字符串"""
         # 加载图片
         image = self._load_image(image_input)
         
         try:
+            # 转换为RGB（只转换一次，调试保存和编码共用）
+            rgb_image = self._convert_to_rgb(image)
+            
+            # 缩小超大图片（模型端同样会缩放，全分辨率只会浪费编码、base64和带宽）
+            width, height = rgb_image.size
+            if self.max_dim and max(width, height) > self.max_dim:
+                scale = self.max_dim / max(width, height)
+                new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+                rgb_image = rgb_image.resize(new_size, Image.Resampling.LANCZOS)
+            
+            # 只编码一次，调试图片直接写入发送给模型的同一份JPEG字节
+            jpeg_bytes = self._encode_jpeg(rgb_image)
+            
             # 保存调试图片
             if self.save_debug_images:
-                self._save_debug_image(image, context)
-            
-            # 转换为RGB
-            image = self._convert_to_rgb(image)
+                self._save_debug_image(rgb_image, context, already_rgb=True, jpeg_bytes=jpeg_bytes)
             
             # 编码为base64
-            buffer = io.BytesIO()
-            image.save(buffer, format='JPEG')
-            buffer.seek(0)
-            return base64.b64encode(buffer.read()).decode('utf-8')
+            return b64.b64encode(jpeg_bytes).decode('ascii')
         finally:
             # 确保图片对象被关闭，释放文件句柄
             # 注意：PIL Image对象在垃圾回收时会自动关闭，但显式关闭更安全
-            if hasattr(image, 'close') and image.fp is not None:
+            if hasattr(image, 'close') and getattr(image, 'fp', None) is not None:
                 try:
                     image.close()
                 except:
                     pass
     
+    @staticmethod
+    def _build_messages(prompt: str, image_base64: str) -> list:
+        """构建包含一张图片的请求消息"""
+        # 完全按照工作示例的格式构建消息
+        # 重要：只有一条消息，content 是列表，先文本后图片
+        return [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/jpeg;base64,{image_base64}"
+                        }
+                    },
+                ],
+            }
+        ]
+    
     def analyze_image(
         self, 
         image_input: Union[str, Path, bytes, Image.Image], 
@@ -778,39 +1061,23 @@ class GeminiClient:
         Returns:
             模型的响应文本
         """
+        completion = None
         try:
             # 编码图片
             image_base64 = self._encode_image(image_input, context=context or "analyze")
             
-            # 完全按照工作示例的格式构建消息
-            # 重要：只有一条消息，content 是列表，先文本后图片
-            messages = [
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                    ],
-                }
-            ]
-            
-            # 添加图片（完全复制示例代码的逻辑）
-            img_cont = {
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/jpeg;base64,{image_base64}"
-                }
-            }
-            messages[0]['content'].append(img_cont)
-            
-            print(f"[DEBUG] 调用API - model: {self.model_name}")
-            print(f"[DEBUG] prompt长度: {len(prompt)}, image_base64长度: {len(image_base64)}")
-            print(f"[DEBUG] messages 数量: {len(messages)}")
-            print(f"[DEBUG] messages[0]['content'] 数量: {len(messages[0]['content'])}")
+            messages = self._build_messages(prompt, image_base64)
             
-            # 打印实际发送的 messages 结构（用于调试）
-            print(f"[DEBUG] 完整 messages 结构（前500字符）:")
-            messages_str = json.dumps(messages, ensure_ascii=False)[:500]
-            print(messages_str)
+            if _DEBUG:
+                print(f"[DEBUG] 调用API - model: {self.model_name}")
+                print(f"[DEBUG] prompt长度: {len(prompt)}, image_base64长度: {len(image_base64)}")
+                print(f"[DEBUG] messages 数量: {len(messages)}")
+                print(f"[DEBUG] messages[0]['content'] 数量: {len(messages[0]['content'])}")
+                
+                # 打印实际发送的 messages 结构（用于调试）
+                print(f"[DEBUG] 完整 messages 结构（前500字符）:")
+                messages_str = json.dumps(messages, ensure_ascii=False)[:500]
+                print(messages_str)
             
             # 调用API（使用LBOpenAIClient，完全按照debug_qwen3vl.py的格式）
             completion = self.client.chat.completions.create(
@@ -820,7 +1087,8 @@ class GeminiClient:
                 max_tokens=max_tokens
             )
             
-            print(f"[DEBUG] API调用成功")
+            if _DEBUG:
+                print(f"[DEBUG] API调用成功")
             
             # 检查是否有错误响应（自定义错误格式）
             if hasattr(completion, 'success') and completion.success is False:
@@ -833,11 +1101,12 @@ class GeminiClient:
             # print(f"[DEBUG] completion 是否为 None: {completion is None}")
             
             # 尝试打印 completion 对象
-            try:
-                completion_dump = completion.model_dump() if hasattr(completion, 'model_dump') else str(completion)
-                print(f"[DEBUG] completion 对象: {completion_dump}")
-            except Exception as e:
-                print(f"[DEBUG] 无法打印 completion 对象: {e}")
+            if _DEBUG:
+                try:
+                    completion_dump = completion.model_dump() if hasattr(completion, 'model_dump') else str(completion)
+                    print(f"[DEBUG] completion 对象: {completion_dump}")
+                except Exception as e:
+                    print(f"[DEBUG] 无法打印 completion 对象: {e}")
             # ========== 调试信息结束 ==========
             
             # 验证响应
@@ -860,16 +1129,15 @@ class GeminiClient:
             if len(completion.choices) == 0:
                 raise ValueError("choices 列表长度为 0")
             
-            print(f"[DEBUG] choices 长度: {len(completion.choices)}")
-            print(f"[DEBUG] choices[0]: {completion.choices[0]}")
+            if _DEBUG:
+                print(f"[DEBUG] choices 长度: {len(completion.choices)}")
             
             if not hasattr(completion.choices[0], 'message'):
                 print(f"[ERROR] choices[0] 没有 message 属性")
-                print(f"[DEBUG] choices[0] 的所有属性: {dir(completion.choices[0])}")
+                if _DEBUG:
+                    print(f"[DEBUG] choices[0] 的所有属性: {dir(completion.choices[0])}")
                 raise ValueError("API 响应中没有 message 字段")
             
-            print(f"[DEBUG] message: {completion.choices[0].message}")
-            
             content = completion.choices[0].message.content
             
             if content is None:
@@ -878,18 +1146,17 @@ class GeminiClient:
             if content == "":
                 print(f"[WARNING] API 返回的内容为空字符串")
             
-            print(f"[DEBUG] 响应内容长度: {len(content)}")
+            if _DEBUG:
+                print(f"[DEBUG] 响应内容长度: {len(content)}")
             
             return content
         
         except AttributeError as e:
             error_msg = f"API 响应格式错误: {e}"
             print(f"[ERROR] {error_msg}")
-            try:
-                print(f"[DEBUG] completion 对象类型: {type(completion)}")
-                print(f"[DEBUG] completion 对象: {completion}")
-            except:
-                print(f"[DEBUG] 无法打印 completion 对象")
+            if _DEBUG:
+                # 惰性格式化：日志级别未开启时不会构造completion的repr
+                logger.debug("completion: %r", completion)
             raise ValueError(error_msg)
         
         except Exception as e:
@@ -899,63 +1166,112 @@ class GeminiClient:
             print(f"[DEBUG] 完整错误堆栈:\n{traceback.format_exc()}")
             raise
     
+    def analyze_images(
+        self,
+        image_inputs: List[Union[str, Path, bytes, Image.Image]],
+        prompts: Union[str, List[str]],
+        temperature: float = 0.7,
+        max_tokens: int = 4096,
+        max_workers: int = 8
+    ) -> List[Union[str, Exception]]:
+        """
+        并发分析多张图片（线程池中同时进行图片编码和API调用）
+        
+        Args:
+            image_inputs: 图片输入列表
+            prompts: 提示词，可以是所有图片共用的一个字符串，也可以是与图片一一对应的列表
+            temperature: 温度参数
+            max_tokens: 最大token数
+            max_workers: 最大并发线程数
+            
+        Returns:
+            与image_inputs顺序一致的响应文本列表，失败的项为对应的异常对象
+        """
+        if isinstance(prompts, str):
+            prompts = [prompts] * len(image_inputs)
+        if len(prompts) != len(image_inputs):
+            raise ValueError(f"prompts数量({len(prompts)})与图片数量({len(image_inputs)})不一致")
+        
+        def analyze_one(args):
+            index, image_input, prompt = args
+            try:
+                return self.analyze_image(
+                    image_input,
+                    prompt,
+                    temperature=temperature,
+                    context=f"analyze_{index}",
+                    max_tokens=max_tokens
+                )
+            except Exception as e:
+                return e
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(analyze_one, zip(range(len(image_inputs)), image_inputs, prompts)))
+    
     def _extract_json_from_response(self, response_text: str) -> Dict[str, Any]:
         """从响应文本中提取JSON"""
         if not response_text:
             raise ValueError("响应文本为空")
         
-        # 尝试提取 ```json ... ``` 代码块
-        json_block_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response_text, re.DOTALL)
-        if json_block_match:
-            response_text = json_block_match.group(1)
-        else:
-            # 提取第一个完整的JSON对象
+        try:
+            # 尝试提取 ```json ... ``` 代码块
+            json_block_match = _JSON_BLOCK_RE.search(response_text)
+            if json_block_match:
+                return _JSON_DECODER.raw_decode(json_block_match.group(1))[0]
+            
+            # 提取第一个完整的JSON对象（raw_decode在C中解析并处理嵌套括号）；
+            # 失败时跳过该'{'配平的整段再尝试下一个'{'，不把嵌套在解析失败的对象内部的内层对象当作结果
             start_idx = response_text.find('{')
-            if start_idx != -1:
-                brace_count = 0
-                for i in range(start_idx, len(response_text)):
-                    if response_text[i] == '{':
-                        brace_count += 1
-                    elif response_text[i] == '}':
-                        brace_count -= 1
-                        if brace_count == 0:
-                            response_text = response_text[start_idx:i+1]
-                            break
-        
-        return json.loads(response_text)
+            while start_idx != -1:
+                try:
+                    return _JSON_DECODER.raw_decode(response_text, start_idx)[0]
+                except json.JSONDecodeError:
+                    end_idx = _balanced_brace_end(response_text, start_idx)
+                    if end_idx == -1:
+                        break  # 对象未闭合（如输出被截断），之后的'{'都在它内部
+                    start_idx = response_text.find('{', end_idx)
+            
+            # 没有找到JSON对象时按整体解析（raw_decode容忍尾部多余内容）
+            return _JSON_DECODER.raw_decode(response_text.lstrip())[0]
+        except json.JSONDecodeError as e:
+            # 模型常输出尾逗号、单引号、未加引号的键等非严格JSON，用json5宽松解析兜底
+            # （只在严格解析失败时才导入和调用，成功路径不受影响）
+            result = self._parse_lenient_json(response_text)
+            if result is None:
+                raise e
+            return result
     
-    def filter_image(
-        self,
-        image_input: Union[str, Path, bytes, Image.Image],
-        criteria_description: str,
-        question: str,
-        temperature: float = 0.3,
-        max_tokens: int = 4096
-    ) -> Dict[str, Any]:
+    @staticmethod
+    def _parse_lenient_json(response_text: str) -> Optional[Dict[str, Any]]:
         """
-        使用模型筛选图片
+        用json5宽松解析响应中的JSON对象，json5未安装或解析失败时返回None
         
-        Args:
-            image_input: 图片输入
-            criteria_description: 筛选标准描述
-            question: 问题描述
-            temperature: 温度参数
-            max_tokens: 最大token数
-            
-        Returns:
-            筛选结果字典
+        只尝试最外层的'{...}'片段，不会退回到嵌套在其中的内层对象
         """
-        # 验证输入
-        if not criteria_description or not criteria_description.strip():
-            print(f"[WARNING] criteria_description 为空!")
-            criteria_description = "无特定标准"
+        try:
+            import json5
+        except ImportError:
+            return None
         
-        if not question or not question.strip():
-            print(f"[WARNING] question 为空!")
-            question = "通用筛选"
+        json_block_match = _JSON_BLOCK_RE.search(response_text)
+        if json_block_match:
+            candidates = [json_block_match.group(1)]
+        else:
+            candidates = _outer_json_spans(response_text)
         
-        # 构建prompt
-        prompt = f"""You are a professional image filtering and quality evaluation expert.
+        for candidate in candidates:
+            try:
+                result = json5.loads(candidate)
+            except ValueError:
+                continue
+            if isinstance(result, dict):
+                return result
+        return None
+    
+    @staticmethod
+    def _build_filter_prompt(criteria_description: str, question: str) -> str:
+        """构建图片筛选提示词"""
+        return f"""You are a professional image filtering and quality evaluation expert.
 
 Your task is to evaluate whether an image meets the required criteria, and to assign a quality score based on how well it satisfies both required and optional standards.
 
@@ -996,6 +1312,62 @@ Return the result in JSON format ONLY, with no extra text:
   "reason": "Detailed explanation",
   "confidence": float (0.0-1.0)
 }}"""
+    
+    @staticmethod
+    def _normalize_filter_result(result: Dict[str, Any]) -> Dict[str, Any]:
+        """补全筛选结果中缺失的字段"""
+        result.setdefault("passed", False)
+        result.setdefault("reason", "无法解析筛选结果")
+        result.setdefault("confidence", 0.5)
+        result.setdefault("basic_score", 0.0)
+        result.setdefault("bonus_score", 0.0)
+        result.setdefault("total_score", 0.0)
+        return result
+    
+    @staticmethod
+    def _filter_error_result(error_msg: str) -> Dict[str, Any]:
+        """构建筛选失败时返回的结果"""
+        return {
+            "passed": False,
+            "basic_score": 0.0,
+            "bonus_score": 0.0,
+            "total_score": 0.0,
+            "reason": error_msg,
+            "confidence": 0.0
+        }
+    
+    def filter_image(
+        self,
+        image_input: Union[str, Path, bytes, Image.Image],
+        criteria_description: str,
+        question: str,
+        temperature: float = 0.3,
+        max_tokens: int = 4096
+    ) -> Dict[str, Any]:
+        """
+        使用模型筛选图片
+        
+        Args:
+            image_input: 图片输入
+            criteria_description: 筛选标准描述
+            question: 问题描述
+            temperature: 温度参数
+            max_tokens: 最大token数
+            
+        Returns:
+            筛选结果字典
+        """
+        # 验证输入
+        if not criteria_description or not criteria_description.strip():
+            print(f"[WARNING] criteria_description 为空!")
+            criteria_description = "无特定标准"
+        
+        if not question or not question.strip():
+            print(f"[WARNING] question 为空!")
+            question = "通用筛选"
+        
+        # 构建prompt
+        prompt = self._build_filter_prompt(criteria_description, question)
         
         try:
             # 使用question前30字符作为context
@@ -1021,12 +1393,7 @@ Return the result in JSON format ONLY, with no extra text:
             result = self._extract_json_from_response(response_text)
             
             # 验证并补充缺失字段
-            result.setdefault("passed", False)
-            result.setdefault("reason", "无法解析筛选结果")
-            result.setdefault("confidence", 0.5)
-            result.setdefault("basic_score", 0.0)
-            result.setdefault("bonus_score", 0.0)
-            result.setdefault("total_score", 0.0)
+            result = self._normalize_filter_result(result)
             
             print(f"[INFO] 筛选完成，passed: {result['passed']}, score: {result['total_score']}")
             
@@ -1036,14 +1403,7 @@ Return the result in JSON format ONLY, with no extra text:
             # API 调用或响应解析错误
             error_msg = f"筛选过程出错: {str(e)}"
             print(f"[ERROR] {error_msg}")
-            return {
-                "passed": False,
-                "basic_score": 0.0,
-                "bonus_score": 0.0,
-                "total_score": 0.0,
-                "reason": error_msg,
-                "confidence": 0.0
-            }
+            return self._filter_error_result(error_msg)
         
         except Exception as e:
             # 其他未预期的错误
@@ -1051,14 +1411,191 @@ Return the result in JSON format ONLY, with no extra text:
             print(f"[ERROR] {error_msg}")
             import traceback
             print(f"[DEBUG] 完整错误堆栈:\n{traceback.format_exc()}")
-            return {
-                "passed": False,
-                "basic_score": 0.0,
-                "bonus_score": 0.0,
-                "total_score": 0.0,
-                "reason": error_msg,
-                "confidence": 0.0
-            }
+            return self._filter_error_result(error_msg)
+    
+    async def filter_image_async(
+        self,
+        image_input: Union[str, Path, bytes, Image.Image],
+        criteria_description: str,
+        question: str,
+        temperature: float = 0.3,
+        max_tokens: int = 4096
+    ) -> Dict[str, Any]:
+        """filter_image的异步版本（在线程中执行同步请求，不阻塞事件循环）"""
+        return await asyncio.to_thread(
+            self.filter_image,
+            image_input,
+            criteria_description,
+            question,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+    
+    def filter_images(
+        self,
+        items: List[Dict[str, Any]],
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+        concurrency: int = 16,
+        stagger_delay: float = 0.05
+    ) -> List[Dict[str, Any]]:
+        """
+        并发筛选多张图片（同时最多concurrency个请求在途）
+        
+        Args:
+            items: 数据项列表，每项包含image_input, criteria_description, question
+            temperature: 温度参数
+            max_tokens: 最大token数
+            concurrency: 最大并发请求数
+            stagger_delay: 相邻请求的启动间隔（秒），错开图片编码/上传/生成各阶段，避免同时涌入
+            
+        Returns:
+            筛选结果列表，与items顺序一致
+        """
+        return asyncio.run(
+            self._filter_images_async(items, temperature, max_tokens, concurrency, stagger_delay)
+        )
+    
+    async def _filter_images_async(
+        self,
+        items: List[Dict[str, Any]],
+        temperature: float,
+        max_tokens: int,
+        concurrency: int,
+        stagger_delay: float = 0.0
+    ) -> List[Dict[str, Any]]:
+        """并发执行filter_image_async，用信号量限制在途请求数，按stagger_delay间隔依次启动"""
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def bounded(item: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.filter_image_async(
+                    item.get("image_input"),
+                    item.get("criteria_description", ""),
+                    item.get("question", ""),
+                    temperature=temperature,
+                    max_tokens=max_tokens
+                )
+        
+        tasks = []
+        for item in items:
+            tasks.append(asyncio.create_task(bounded(item)))
+            if stagger_delay > 0:
+                await asyncio.sleep(stagger_delay)
+        return await asyncio.gather(*tasks)
+    
+    def filter_images_batch(
+        self,
+        items: List[Dict[str, Any]],
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+        poll_interval: float = 60.0,
+        max_wait: float = 24 * 3600
+    ) -> List[Dict[str, Any]]:
+        """
+        通过Batch接口离线批量筛选图片（异步执行，24小时内返回，费用约为实时调用的一半）
+        
+        服务端不支持Batch接口时，回退为逐张调用filter_image。
+        
+        Args:
+            items: 数据项列表，每项包含image_input, criteria_description, question
+            temperature: 温度参数
+            max_tokens: 最大token数
+            poll_interval: 查询任务状态的间隔（秒）
+            max_wait: 最长等待时间（秒）
+            
+        Returns:
+            筛选结果列表，与items顺序一致
+        """
+        if not items:
+            return []
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        
+        # 构建JSONL请求文件，每行一个请求，用custom_id对应回原始顺序
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', encoding='utf-8', delete=False) as f:
+            request_file = f.name
+            for i, item in enumerate(items):
+                try:
+                    image_base64 = self._encode_image(item.get("image_input"), context=f"batch_{i}")
+                except Exception as e:
+                    results[i] = self._filter_error_result(f"图片编码失败: {type(e).__name__}: {e}")
+                    continue
+                prompt = self._build_filter_prompt(
+                    item.get("criteria_description") or "无特定标准",
+                    item.get("question") or "通用筛选"
+                )
+                request = {
+                    "custom_id": f"req_{i}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": self.model_name,
+                        "messages": self._build_messages(prompt, image_base64),
+                        "temperature": temperature,
+                        "max_tokens": max_tokens
+                    }
+                }
+                f.write(json.dumps(request, ensure_ascii=False))
+                f.write('\n')
+        
+        try:
+            try:
+                with open(request_file, 'rb') as f:
+                    uploaded = self.client.files.create(file=f, purpose="batch")
+                batch_job = self.client.batches.create(
+                    input_file_id=uploaded.id,
+                    endpoint="/v1/chat/completions",
+                    completion_window="24h"
+                )
+            except _BATCH_UNSUPPORTED_ERRORS as e:
+                print(f"[WARNING] 服务端不支持Batch接口（{type(e).__name__}: {e}），回退为逐张筛选")
+                return [
+                    result or self.filter_image(
+                        item.get("image_input"),
+                        item.get("criteria_description", ""),
+                        item.get("question", ""),
+                        temperature=temperature,
+                        max_tokens=max_tokens
+                    )
+                    for item, result in zip(items, results)
+                ]
+            print(f"[INFO] Batch任务已提交: {batch_job.id}，共 {len(items)} 个请求")
+            
+            # 轮询任务状态
+            deadline = time.monotonic() + max_wait
+            while batch_job.status not in ("completed", "failed", "expired", "cancelled"):
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Batch任务超时未完成: {batch_job.id}")
+                time.sleep(poll_interval)
+                batch_job = self.client.batches.retrieve(batch_job.id)
+            
+            if batch_job.status != "completed" or not batch_job.output_file_id:
+                raise ValueError(f"Batch任务未成功完成: {batch_job.id}, 状态: {batch_job.status}")
+            
+            # 解析结果文件，复用单张筛选的JSON提取逻辑
+            output_text = self.client.files.content(batch_job.output_file_id).text
+            for line in output_text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                i = int(record["custom_id"].rsplit('_', 1)[1])
+                try:
+                    body = record["response"]["body"]
+                    content = body["choices"][0]["message"]["content"]
+                    results[i] = self._normalize_filter_result(self._extract_json_from_response(content))
+                except Exception as e:
+                    results[i] = self._filter_error_result(f"筛选过程出错: {type(e).__name__}: {e}")
+        
+        except Exception as e:
+            error_msg = f"Batch筛选失败: {type(e).__name__}: {e}"
+            print(f"[ERROR] {error_msg}")
+            return [result or self._filter_error_result(error_msg) for result in results]
+        
+        finally:
+            os.remove(request_file)
+        
+        return [result or self._filter_error_result("Batch结果中缺少该请求") for result in results]
 
 
 # 使用示例
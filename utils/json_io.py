@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON结果文件的读写工具，供split_json、split_by_score等脚本共用
+"""
+import os
+import re
+import json
+import mmap
+from itertools import islice
+from pathlib import Path
+from typing import Any, Iterator
+
+# orjson为可选依赖：解析和序列化大结果文件比标准库json快，未安装时回退到json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ijson为可选依赖：流式解析JSON数组，无需把整个文件读入内存
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# 输出文件的写缓冲区大小：逐条写入的小片段先在用户态合并，减少write系统调用次数
+WRITE_BUFFER_SIZE = 1 << 20
+
+# 输入文件的读缓冲区大小：配合顺序预读提示，减少流式解析时的read系统调用次数
+READ_BUFFER_SIZE = 4 << 20
+
+# 超过该大小的输入文件用mmap映射后直接交给orjson解析，省去一次整文件的bytes拷贝
+_MMAP_MIN_SIZE = 1 << 20
+
+# orjson会把超过64位的整数静默转换为浮点数（不报错）；64位整数最多20位，
+# 数据中出现20位以上的连续数字时改用标准库json解析，保证大整数原样保留
+_LONG_DIGITS_RE = re.compile(rb'\d{20}')
+
+
+def open_input(path: Path):
+    """以大缓冲区打开输入文件，并提示内核按顺序预读"""
+    f = open(path, 'rb', buffering=READ_BUFFER_SIZE)
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass  # 部分文件系统不支持，忽略即可
+    return f
+
+
+def loads(data: bytes) -> Any:
+    """
+    解析JSON字节（优先使用orjson）
+    
+    可能含有超过64位的整数，或orjson拒绝解析（如NaN）时回退到标准库json
+    """
+    if orjson is not None and not _LONG_DIGITS_RE.search(data):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # 标准库可以解析的非标准JSON（如NaN、Infinity）
+    return json.loads(data if isinstance(data, (bytes, str)) else bytes(data))
+
+
+def load_json(path: Path) -> Any:
+    """读取JSON文件（优先使用orjson）"""
+    with open_input(path) as f:
+        if orjson is not None and os.fstat(f.fileno()).st_size >= _MMAP_MIN_SIZE:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                mm = None  # 部分平台或文件系统不支持mmap，回退到read
+            if mm is not None:
+                with mm, memoryview(mm) as mv:
+                    return loads(mv)
+        data = f.read()
+    return loads(data)
+
+
+def stream_items(path: Path) -> Iterator[Any]:
+    """
+    用ijson逐条产出JSON数组中的记录（小数解析为float）
+    
+    ijson的C后端在use_float=True时遇到超过64位的整数会报integer overflow，
+    此时改用纯Python后端重新解析，跳过已经产出的记录后继续
+    """
+    produced = 0
+    try:
+        with open_input(path) as f:
+            for item in ijson.items(f, 'item', use_float=True):
+                yield item
+                produced += 1
+        return
+    except ijson.JSONError:
+        if ijson.backend == 'python':
+            raise
+    
+    python_backend = ijson.get_backend('python')
+    with open_input(path) as f:
+        yield from islice(python_backend.items(f, 'item', use_float=True), produced, None)
+
+
+def dumps(obj: Any) -> bytes:
+    """序列化为缩进格式的UTF-8字节（优先使用orjson）"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # orjson不支持的类型（如超过64位的整数），回退到标准库
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def dumps_line(obj: Any) -> bytes:
+    """序列化为单行紧凑格式的UTF-8字节（优先使用orjson）"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class JsonArrayWriter:
+    """逐条写入JSON数组：默认每行一条紧凑记录，pretty=True时与json.dump(indent=2)输出一致"""
+    suffix = '.json'
+
+    def __init__(self, path: Path, pretty: bool = False):
+        self.path = path
+        self.count = 0
+        self.pretty = pretty
+        self._sep = b',\n  ' if pretty else b',\n'
+        self._f = open(path, 'wb', buffering=WRITE_BUFFER_SIZE)
+        self._f.write(b'[')
+
+    def write(self, item: Any) -> None:
+        if self.pretty:
+            # JSON字符串中不会出现原始换行符，整体缩进一层即可嵌入数组
+            payload = dumps(item).replace(b'\n', b'\n  ')
+        else:
+            payload = dumps_line(item)
+        self._f.write((self._sep if self.count else self._sep[1:]) + payload)
+        self.count += 1
+
+    def close(self) -> None:
+        self._f.write(b'\n]' if self.count else b']')
+        self._f.close()
+
+
+class NdjsonWriter:
+    """逐行写入NDJSON（每行一条紧凑格式的记录），下游可逐行读取"""
+    suffix = '.ndjson'
+
+    def __init__(self, path: Path, pretty: bool = False):
+        self.path = path
+        self.count = 0  # NDJSON每行一条记录，不支持缩进，忽略pretty
+        self._f = open(path, 'wb', buffering=WRITE_BUFFER_SIZE)
+
+    def write(self, item: Any) -> None:
+        self._f.write(dumps_line(item) + b'\n')
+        self.count += 1
+
+    def close(self) -> None:
+        self._f.close()
+
+
+# 输出格式 -> 写入器
+WRITERS = {"json": JsonArrayWriter, "ndjson": NdjsonWriter}
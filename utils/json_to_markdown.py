@@ -3,14 +3,40 @@
 """
 将JSON结果文件转换为Markdown格式，自动检测并可视化base64图片
 """
-import json
+import sys
 import base64
+import binascii
 import re
 import argparse
 from pathlib import Path
 from typing import Dict, Any, List, Optional, Tuple
 import hashlib
 
+# 作为脚本运行时（python utils/json_to_markdown.py）把项目根目录加入路径，以便导入utils包
+_project_root = str(Path(__file__).resolve().parent.parent)
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+
+from utils.json_io import dumps, load_json
+
+# 预编译的正则表达式（查找图片时会对每个字符串值调用）
+_DATA_URI_RE = re.compile(r'data:image/(\w+);base64,')
+_WS_RE = re.compile(r'\s')
+_B64_PREFIX_RE = re.compile(r'[A-Za-z0-9+/]+')
+
+# 每条记录输出的字段表：(字段名, 显示名称, 格式)
+_BASIC_FIELDS = (
+    ("id", "ID", "`{}`"),
+    ("sample_index", "样本索引", "`{}`"),
+    ("timestamp", "时间戳", "`{}`"),
+)
+_SCORE_FIELDS = (
+    ("total_score", "总分", "`{:.3f}`"),
+    ("basic_score", "基础分", "`{:.3f}`"),
+    ("bonus_score", "奖励分", "`{:.3f}`"),
+    ("confidence", "置信度", "`{:.3f}`"),
+)
+
 
 def is_base64_image(data: Any) -> Tuple[bool, Optional[str]]:
     """
@@ -22,81 +48,103 @@ def is_base64_image(data: Any) -> Tuple[bool, Optional[str]]:
     Returns:
         (是否为base64图片, 图片格式)
     """
-    if not isinstance(data, str):
+    # base64图片字符串通常很长（至少几百字符），短字符串直接排除
+    if not isinstance(data, str) or len(data) < 100:
         return False, None
     
     # 检查是否是data URI格式
     if data.startswith('data:image/'):
         # 提取格式: data:image/jpeg;base64,...
-        match = re.match(r'data:image/(\w+);base64,', data)
+        match = _DATA_URI_RE.match(data)
         if match:
             return True, match.group(1)
     
-    # 检查是否是纯base64字符串
-    # base64字符串通常很长（至少几百字符）
-    if len(data) < 100:
+    # 快速排除：开头不是base64字符（普通文本）时不做任何解码
+    if not _B64_PREFIX_RE.fullmatch(data, 0, 16):
         return False, None
     
     # 移除空白字符
-    clean_data = re.sub(r'\s', '', data)
+    clean_data = _WS_RE.sub('', data)
+    if len(clean_data) % 4 != 0:
+        return False, None
     
-    # 尝试解码
+    # 严格校验并解码整个字符串（binascii.a2b_base64的strict_mode直接在C层校验，比b64decode(validate=True)快），
+    # 只有整体都是合法base64时才认为是图片，文件头只用于识别格式
     try:
-        decoded = base64.b64decode(clean_data, validate=True)
-        
-        # 检查是否是图片格式（通过文件头）
-        if decoded.startswith(b'\xff\xd8\xff'):
-            return True, 'jpeg'
-        elif decoded.startswith(b'\x89PNG\r\n\x1a\n'):
-            return True, 'png'
-        elif decoded.startswith(b'GIF87a') or decoded.startswith(b'GIF89a'):
-            return True, 'gif'
-        elif decoded.startswith(b'RIFF') and b'WEBP' in decoded[:12]:
-            return True, 'webp'
-        elif decoded.startswith(b'BM'):
-            return True, 'bmp'
-        
-        # 如果解码成功但不确定格式，假设是jpeg
-        if len(decoded) > 100:
-            return True, 'jpeg'
-            
-    except Exception:
-        pass
+        decoded = binascii.a2b_base64(clean_data, strict_mode=True)
+    except (binascii.Error, ValueError):
+        return False, None
+    
+    img_format = _sniff_image_format(decoded[:12])
+    if img_format:
+        return True, img_format
+    
+    # 解码成功但不确定格式，数据足够长时假设是jpeg
+    if len(decoded) > 100:
+        return True, 'jpeg'
     
     return False, None
 
 
+def _sniff_image_format(header: bytes) -> Optional[str]:
+    """根据文件头识别图片格式，无法识别时返回None"""
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    elif header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    elif header.startswith(b'GIF87a') or header.startswith(b'GIF89a'):
+        return 'gif'
+    elif header.startswith(b'RIFF') and b'WEBP' in header[:12]:
+        return 'webp'
+    elif header.startswith(b'BM'):
+        return 'bmp'
+    return None
+
+
 def find_base64_images(obj: Any, path: str = "") -> List[Tuple[str, str, str]]:
     """
-    递归查找对象中的所有base64图片
+    查找对象中的所有base64图片（显式栈迭代遍历，不受递归深度限制）
     
     Args:
         obj: 要搜索的对象
-        path: 当前路径（用于标识位置）
+        path: 根路径前缀（用于标识位置）
         
     Returns:
         [(路径, base64数据, 格式), ...]
     """
     images = []
+    # 栈中保存(节点, 路径片段元组)，只在找到图片时才拼接路径字符串
+    stack = [(obj, ())]
     
-    if isinstance(obj, dict):
-        for key, value in obj.items():
-            current_path = f"{path}.{key}" if path else key
-            is_img, img_format = is_base64_image(value)
+    while stack:
+        node, parts = stack.pop()
+        
+        if isinstance(node, dict):
+            # 逆序入栈，保证按原始顺序输出
+            for key, value in reversed(node.items()):
+                stack.append((value, parts + (key,)))
+        elif isinstance(node, list):
+            for i in range(len(node) - 1, -1, -1):
+                stack.append((node[i], parts + (i,)))
+        elif isinstance(node, str):
+            is_img, img_format = is_base64_image(node)
             if is_img:
-                images.append((current_path, value, img_format))
-            else:
-                # 递归搜索
-                images.extend(find_base64_images(value, current_path))
-    
-    elif isinstance(obj, list):
-        for i, item in enumerate(obj):
-            current_path = f"{path}[{i}]"
-            images.extend(find_base64_images(item, current_path))
+                images.append((_join_path(path, parts), node, img_format))
     
     return images
 
 
+def _join_path(root: str, parts: tuple) -> str:
+    """将路径片段拼接为 a.b[0].c 形式的路径字符串"""
+    current = root
+    for part in parts:
+        if isinstance(part, int):
+            current = f"{current}[{part}]"
+        else:
+            current = f"{current}.{part}" if current else str(part)
+    return current
+
+
 def format_value(value: Any, indent: int = 0) -> str:
     """
     格式化值为Markdown友好的格式
@@ -117,6 +165,10 @@ def format_value(value: Any, indent: int = 0) -> str:
     elif isinstance(value, (int, float)):
         return f"`{value}`"
     elif isinstance(value, str):
+        # 短字符串不可能是base64图片，直接输出
+        if len(value) < 100:
+            return f"`{value}`"
+        
         # 检查是否是base64图片
         is_img, img_format = is_base64_image(value)
         if is_img:
@@ -150,11 +202,37 @@ def format_value(value: Any, indent: int = 0) -> str:
         return f"`{str(value)}`"
 
 
+def _write_image_asset(img_data: str, img_format: str, assets_dir: Path, seen: Dict[str, str]) -> Optional[str]:
+    """
+    将base64图片解码写入assets目录，返回相对路径；按内容哈希去重，相同图片只写一次
+    
+    base64数据无法解码时返回None，由调用方回退为内联显示
+    """
+    payload = img_data.split(',', 1)[1] if img_data.startswith('data:image/') else img_data
+    digest = hashlib.sha1(payload.encode('ascii', 'ignore')).hexdigest()[:16]
+    
+    rel_path = seen.get(digest)
+    if rel_path is None:
+        filename = f"{digest}.{img_format}"
+        asset_file = assets_dir / filename
+        if not asset_file.exists():
+            try:
+                decoded = base64.b64decode(payload)
+            except (binascii.Error, ValueError):
+                return None
+            assets_dir.mkdir(parents=True, exist_ok=True)
+            asset_file.write_bytes(decoded)
+        rel_path = f"{assets_dir.name}/{filename}"
+        seen[digest] = rel_path
+    return rel_path
+
+
 def json_to_markdown(
     input_file: Path,
     output_file: Path,
     max_records: Optional[int] = None,
-    include_images: bool = True
+    include_images: bool = True,
+    inline_images: bool = False
 ) -> None:
     """
     将JSON文件转换为Markdown格式
@@ -164,10 +242,11 @@ def json_to_markdown(
         output_file: 输出Markdown文件路径
         max_records: 最大处理记录数（None表示全部）
         include_images: 是否包含图片可视化
+        inline_images: 是否以data URI内嵌图片；默认将图片按内容哈希去重后写入
+            输出目录下的assets/，Markdown中只引用文件路径
     """
     print(f"[INFO] 读取输入文件: {input_file}")
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = load_json(input_file)
     
     if not isinstance(data, list):
         data = [data]
@@ -179,118 +258,121 @@ def json_to_markdown(
     else:
         print(f"[INFO] 处理 {total} 条记录")
     
-    # 生成Markdown内容
-    md_lines = []
-    
-    # 标题
-    md_lines.append("# JSON结果可视化")
-    md_lines.append("")
-    md_lines.append(f"**总记录数**: {total}")
-    md_lines.append(f"**显示记录数**: {len(data)}")
-    md_lines.append("")
-    md_lines.append("---")
-    md_lines.append("")
-    
-    # 处理每条记录
-    for idx, record in enumerate(data, 1):
-        md_lines.append(f"## 记录 {idx}")
-        md_lines.append("")
+    # 边生成边写入Markdown文件，不在内存中拼接完整内容
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        write = f.write
         
-        # 基本信息
-        if "id" in record:
-            md_lines.append(f"**ID**: `{record['id']}`")
-        if "sample_index" in record:
-            md_lines.append(f"**样本索引**: `{record['sample_index']}`")
-        if "timestamp" in record:
-            md_lines.append(f"**时间戳**: `{record['timestamp']}`")
-        md_lines.append("")
+        def emit(*parts: str) -> None:
+            """写入一行（多个片段依次写入，避免拼接大字符串）"""
+            for part in parts:
+                write(part)
+            write('\n')
         
-        # 查找并显示base64图片
-        if include_images:
-            images = find_base64_images(record)
-            if images:
-                md_lines.append("### 📷 图片")
-                md_lines.append("")
-                for img_path, img_data, img_format in images:
-                    md_lines.append(f"**位置**: `{img_path}`")
-                    md_lines.append(f"**格式**: {img_format}")
-                    md_lines.append("")
-                    
-                    # 转换为data URI并显示
-                    if img_data.startswith('data:image/'):
-                        data_uri = img_data
-                    else:
-                        data_uri = f"data:image/{img_format};base64,{img_data}"
-                    
-                    md_lines.append(f'<img src="{data_uri}" alt="Image at {img_path}" style="max-width: 600px; border: 1px solid #ddd; border-radius: 4px; padding: 5px;" />')
-                    md_lines.append("")
+        # 标题
+        emit("# JSON结果可视化")
+        emit("")
+        emit(f"**总记录数**: {total}")
+        emit(f"**显示记录数**: {len(data)}")
+        emit("")
+        emit("---")
+        emit("")
         
-        # 筛选结果
-        if "pipeline_type" in record:
-            md_lines.append("### Pipeline信息")
-            md_lines.append("")
-            md_lines.append(f"- **类型**: `{record.get('pipeline_type', 'N/A')}`")
-            if "pipeline_name" in record:
-                md_lines.append(f"- **名称**: {record['pipeline_name']}")
-            md_lines.append("")
+        # 已写出的图片：内容哈希 -> 相对路径（相同图片只写一次）
+        assets_dir = output_file.parent / "assets"
+        seen_assets: Dict[str, str] = {}
         
-        # 筛选结果
-        if "passed" in record:
-            md_lines.append("### 筛选结果")
-            md_lines.append("")
-            status = "✅ **通过**" if record.get("passed") else "❌ **未通过**"
-            md_lines.append(f"- **状态**: {status}")
+        # 处理每条记录
+        total_images = 0
+        for idx, record in enumerate(data, 1):
+            emit(f"## 记录 {idx}")
+            emit("")
             
-            if "total_score" in record:
-                md_lines.append(f"- **总分**: `{record['total_score']:.3f}`")
-            if "basic_score" in record:
-                md_lines.append(f"- **基础分**: `{record['basic_score']:.3f}`")
-            if "bonus_score" in record:
-                md_lines.append(f"- **奖励分**: `{record['bonus_score']:.3f}`")
-            if "confidence" in record:
-                md_lines.append(f"- **置信度**: `{record['confidence']:.3f}`")
-            md_lines.append("")
-        
-        # 原因说明
-        if "reason" in record:
-            md_lines.append("### 原因说明")
-            md_lines.append("")
-            md_lines.append(record['reason'])
-            md_lines.append("")
-        
-        # 错误信息
-        if "error" in record:
-            md_lines.append("### ⚠️ 错误信息")
-            md_lines.append("")
-            md_lines.append(f"```")
-            md_lines.append(record['error'])
-            md_lines.append(f"```")
-            md_lines.append("")
-        
-        # 完整数据（折叠）
-        md_lines.append("<details>")
-        md_lines.append("<summary>完整数据（点击展开）</summary>")
-        md_lines.append("")
-        md_lines.append("```json")
-        md_lines.append(json.dumps(record, ensure_ascii=False, indent=2))
-        md_lines.append("```")
-        md_lines.append("")
-        md_lines.append("</details>")
-        md_lines.append("")
-        
-        md_lines.append("---")
-        md_lines.append("")
-    
-    # 保存Markdown文件
-    output_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(md_lines))
+            # 基本信息
+            for key, label, fmt in _BASIC_FIELDS:
+                if key in record:
+                    emit(f"**{label}**: ", fmt.format(record[key]))
+            emit("")
+            
+            # 查找并显示base64图片
+            if include_images:
+                images = find_base64_images(record)
+                total_images += len(images)
+                if images:
+                    emit("### 📷 图片")
+                    emit("")
+                    for img_path, img_data, img_format in images:
+                        emit(f"**位置**: `{img_path}`")
+                        emit(f"**格式**: {img_format}")
+                        emit("")
+                        
+                        img_attrs = f'" alt="Image at {img_path}" style="max-width: 600px; border: 1px solid #ddd; border-radius: 4px; padding: 5px;" />'
+                        asset_path = None if inline_images else _write_image_asset(img_data, img_format, assets_dir, seen_assets)
+                        if asset_path is not None:
+                            emit('<img src="', asset_path, img_attrs)
+                        else:
+                            # 以data URI显示（前缀和base64数据分开写入，不复制整段数据）；
+                            # 未开启内联但数据无法解码时同样回退为内联，不中断整个转换
+                            prefix = '' if img_data.startswith('data:image/') else f"data:image/{img_format};base64,"
+                            emit('<img src="', prefix, img_data, img_attrs)
+                        emit("")
+            
+            # 筛选结果
+            if "pipeline_type" in record:
+                emit("### Pipeline信息")
+                emit("")
+                emit(f"- **类型**: `{record.get('pipeline_type', 'N/A')}`")
+                if "pipeline_name" in record:
+                    emit(f"- **名称**: {record['pipeline_name']}")
+                emit("")
+            
+            # 筛选结果
+            if "passed" in record:
+                emit("### 筛选结果")
+                emit("")
+                status = "✅ **通过**" if record.get("passed") else "❌ **未通过**"
+                emit(f"- **状态**: {status}")
+                
+                for key, label, fmt in _SCORE_FIELDS:
+                    if key in record:
+                        emit(f"- **{label}**: ", fmt.format(record[key]))
+                emit("")
+            
+            # 原因说明
+            if "reason" in record:
+                emit("### 原因说明")
+                emit("")
+                emit(record['reason'])
+                emit("")
+            
+            # 错误信息
+            if "error" in record:
+                emit("### ⚠️ 错误信息")
+                emit("")
+                emit("```")
+                emit(record['error'])
+                emit("```")
+                emit("")
+            
+            # 完整数据（折叠）
+            emit("<details>")
+            emit("<summary>完整数据（点击展开）</summary>")
+            emit("")
+            emit("```json")
+            emit(dumps(record).decode('utf-8'))
+            emit("```")
+            emit("")
+            emit("</details>")
+            emit("")
+            
+            emit("---")
+            emit("")
     
     print(f"[INFO] Markdown文件已保存到: {output_file}")
     
-    # 统计信息
-    total_images = sum(len(find_base64_images(record)) for record in data)
-    print(f"[INFO] 共找到 {total_images} 个base64图片")
+    # 统计信息（图片数在生成时已累计，不再重新遍历）
+    if include_images:
+        print(f"[INFO] 共找到 {total_images} 个base64图片")
 
 
 def main():
@@ -308,6 +390,9 @@ def main():
   
   # 不包含图片可视化（只显示文本）
   python utils/json_to_markdown.py input.json output.md --no-images
+  
+  # 图片以data URI内嵌在Markdown中（单文件，不生成assets/目录）
+  python utils/json_to_markdown.py input.json output.md --inline-images
         """
     )
     
@@ -332,6 +417,11 @@ def main():
         action='store_true',
         help='不包含图片可视化'
     )
+    parser.add_argument(
+        '--inline-images',
+        action='store_true',
+        help='以data URI内嵌图片（默认写入assets/目录并引用）'
+    )
     
     args = parser.parse_args()
     
@@ -347,7 +437,8 @@ def main():
             input_file=input_file,
             output_file=output_file,
             max_records=args.max_records,
-            include_images=not args.no_images
+            include_images=not args.no_images,
+            inline_images=args.inline_images
         )
     except Exception as e:
         print(f"[ERROR] 处理失败: {e}")
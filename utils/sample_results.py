@@ -3,11 +3,131 @@
 """
 从输出结果文件中随机采样n个样本
 """
-import json
+import sys
 import argparse
 import random
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 作为脚本运行时（python utils/sample_results.py）把项目根目录加入路径，以便导入utils包
+_project_root = str(Path(__file__).resolve().parent.parent)
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+
+from utils.json_io import dumps, load_json, stream_items
+
+# ijson为可选依赖：流式解析JSON数组，配合蓄水池采样时无需把整个文件读入内存
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+def _is_eligible(item: Dict[str, Any], exclude_errors: bool, only_passed: bool, only_failed: bool) -> bool:
+    """判断记录是否满足过滤条件"""
+    if (exclude_errors or only_failed) and "error" in item:
+        return False
+    passed = item.get("passed")
+    if only_passed and passed != True:
+        return False
+    if only_failed and passed != False:
+        return False
+    return True
+
+
+def _report_counts(total: int, eligible: int, n: int, has_filter: bool) -> int:
+    """打印记录数统计，返回实际采样数量（可用记录为0时返回0）"""
+    print(f"[INFO] 总记录数: {total}")
+    if has_filter:
+        print(f"[INFO] 过滤后可用记录: {eligible} 条")
+    
+    if eligible == 0:
+        print(f"[ERROR] 过滤后没有可用记录")
+        return 0
+    
+    # 检查采样数量
+    if n > eligible:
+        print(f"[WARNING] 采样数量 ({n}) 大于可用记录数 ({eligible})，将采样所有记录")
+        n = eligible
+    return n
+
+
+def _report_order(indices: List[int], preserve_order: bool) -> None:
+    """打印输出顺序信息"""
+    if preserve_order:
+        print(f"[INFO] 保持原始顺序，采样索引: {indices[:10]}{'...' if len(indices) > 10 else ''}")
+    else:
+        print(f"[INFO] 随机顺序输出")
+
+
+def _sample_in_memory(
+    input_file: Path,
+    n: int,
+    eligible_fn: Callable[[Dict[str, Any]], bool],
+    has_filter: bool,
+    preserve_order: bool
+) -> Optional[List[Dict[str, Any]]]:
+    """整体读入文件后采样，没有可用记录时返回None"""
+    data = load_json(input_file)
+    
+    if not isinstance(data, list):
+        raise ValueError(f"输入文件应该包含一个数组，但得到: {type(data)}")
+    
+    # 应用过滤条件：一次遍历得到符合条件的记录索引，不复制记录列表
+    if has_filter:
+        eligible = [i for i, item in enumerate(data) if eligible_fn(item)]
+    else:
+        eligible = range(len(data))
+    
+    n = _report_counts(len(data), len(eligible), n, has_filter)
+    if n == 0:
+        return None
+    
+    # 随机采样索引，只取出被采样的记录
+    indices = random.sample(eligible, n)
+    if preserve_order:
+        indices.sort()
+    _report_order(indices, preserve_order)
+    return [data[i] for i in indices]
+
+
+def _sample_streaming(
+    input_file: Path,
+    n: int,
+    eligible_fn: Callable[[Dict[str, Any]], bool],
+    has_filter: bool,
+    preserve_order: bool
+) -> Optional[List[Dict[str, Any]]]:
+    """用ijson流式读取并做蓄水池采样（内存中只保留n条记录），没有可用记录时返回None"""
+    reservoir: List[Tuple[int, Dict[str, Any]]] = []
+    total = 0
+    eligible = 0
+    
+    with open(input_file, 'rb') as f:
+        if f.read(64).lstrip()[:1] != b'[':
+            raise ValueError("输入文件应该包含一个数组")
+    
+    for i, item in enumerate(stream_items(input_file)):
+        total = i + 1
+        if not eligible_fn(item):
+            continue
+        if len(reservoir) < n:
+            reservoir.append((i, item))
+        else:
+            j = random.randrange(eligible + 1)
+            if j < n:
+                reservoir[j] = (i, item)
+        eligible += 1
+    
+    if _report_counts(total, eligible, n, has_filter) == 0:
+        return None
+    
+    if preserve_order:
+        reservoir.sort(key=lambda pair: pair[0])
+    else:
+        random.shuffle(reservoir)
+    _report_order([i for i, _ in reservoir], preserve_order)
+    return [item for _, item in reservoir]
 
 
 def sample_results(
@@ -27,74 +147,65 @@ def sample_results(
         input_file: 输入JSON文件路径
         output_file: 输出JSON文件路径
         n: 采样数量
-        seed: 随机种子（用于可重复性）
+        seed: 随机种子（用于可重复性；指定时整体读入文件采样，不走流式采样）
         preserve_order: 是否保持原始顺序（True则按原始顺序输出，False则随机顺序）
+        exclude_errors: 是否排除错误记录
+        only_passed: 是否只采样通过的记录
+        only_failed: 是否只采样未通过的记录（排除错误记录）
     """
-    # 读取输入文件
-    print(f"[INFO] 读取输入文件: {input_file}")
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    if not isinstance(data, list):
-        raise ValueError(f"输入文件应该包含一个数组，但得到: {type(data)}")
-    
-    total = len(data)
-    print(f"[INFO] 总记录数: {total}")
-    
-    # 应用过滤条件
-    if exclude_errors:
-        data = [item for item in data if "error" not in item]
-        print(f"[INFO] 过滤错误记录后: {len(data)} 条")
-    
-    if only_passed:
-        data = [item for item in data if item.get("passed") == True]
-        print(f"[INFO] 仅保留通过记录: {len(data)} 条")
-    
-    if only_failed:
-        data = [item for item in data if item.get("passed") == False and "error" not in item]
-        print(f"[INFO] 仅保留未通过记录: {len(data)} 条")
-    
-    if len(data) == 0:
-        print(f"[ERROR] 过滤后没有可用记录")
-        return
-    
-    # 检查采样数量
-    if n > len(data):
-        print(f"[WARNING] 采样数量 ({n}) 大于可用记录数 ({len(data)})，将采样所有记录")
-        n = len(data)
-    
     # 设置随机种子
     if seed is not None:
         random.seed(seed)
         print(f"[INFO] 使用随机种子: {seed}")
     
-    # 随机采样
-    sampled = random.sample(data, n)
+    def eligible_fn(item: Dict[str, Any]) -> bool:
+        return _is_eligible(item, exclude_errors, only_passed, only_failed)
+    has_filter = exclude_errors or only_passed or only_failed
     
-    # 是否保持原始顺序
-    if preserve_order:
-        # 获取原始索引并排序
-        indices = [data.index(item) for item in sampled]
-        indices.sort()
-        sampled = [data[i] for i in indices]
-        print(f"[INFO] 保持原始顺序，采样索引: {indices[:10]}{'...' if len(indices) > 10 else ''}")
+    # 安装ijson时流式读取+蓄水池采样，内存中只保留n条记录；否则整体读入后采样。
+    # 指定随机种子时始终整体读入后用random.sample采样，同一种子的采样结果与是否安装ijson无关
+    print(f"[INFO] 读取输入文件: {input_file}")
+    if ijson is not None and seed is None:
+        sampled = _sample_streaming(input_file, n, eligible_fn, has_filter, preserve_order)
     else:
-        print(f"[INFO] 随机顺序输出")
+        sampled = _sample_in_memory(input_file, n, eligible_fn, has_filter, preserve_order)
+    if sampled is None:
+        return
+    n = len(sampled)
     
     # 保存输出文件
     output_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(sampled, f, ensure_ascii=False, indent=2)
+    with open(output_file, 'wb') as f:
+        f.write(dumps(sampled))
     
     print(f"[INFO] 已采样 {n} 条记录，保存到: {output_file}")
     
     # 打印统计信息
     if sampled:
-        passed_count = sum(1 for item in sampled if item.get("passed") == True)
-        failed_count = sum(1 for item in sampled if item.get("passed") == False and "error" not in item)
-        error_count = sum(1 for item in sampled if "error" in item)
+        # 一次遍历完成所有统计
+        passed_count = 0
+        failed_count = 0
+        scores = []
+        error_types = {}
+        error_items = []
+        for item in sampled:
+            passed = item.get("passed")
+            has_error = "error" in item
+            if passed == True:
+                passed_count += 1
+            elif passed == False and not has_error:
+                failed_count += 1
+            if "total_score" in item:
+                scores.append(item["total_score"])
+            if has_error:
+                error_msg = item.get("error", "未知错误")
+                # 提取错误类型（取前50个字符）
+                error_key = error_msg[:50] if len(error_msg) > 50 else error_msg
+                error_types[error_key] = error_types.get(error_key, 0) + 1
+                if len(error_items) < 3:
+                    error_items.append(item)
+        error_count = sum(error_types.values())
         
-        scores = [item.get("total_score", 0) for item in sampled if "total_score" in item]
         avg_score = sum(scores) / len(scores) if scores else 0
         
         print(f"\n[统计] 采样结果:")
@@ -110,20 +221,11 @@ def sample_results(
         # 显示错误记录的详细信息
         if error_count > 0:
             print(f"\n[错误详情] 错误记录类型统计:")
-            error_types = {}
-            for item in sampled:
-                if "error" in item:
-                    error_msg = item.get("error", "未知错误")
-                    # 提取错误类型（取前50个字符）
-                    error_key = error_msg[:50] if len(error_msg) > 50 else error_msg
-                    error_types[error_key] = error_types.get(error_key, 0) + 1
-            
             for error_type, count in sorted(error_types.items(), key=lambda x: x[1], reverse=True):
                 print(f"  [{count}次] {error_type}")
             
             # 显示前3个错误记录的完整信息
             print(f"\n[错误详情] 前3个错误记录示例:")
-            error_items = [item for item in sampled if "error" in item][:3]
             for i, item in enumerate(error_items, 1):
                 error_msg = item.get("error", "未知错误")
                 item_id = item.get("id", item.get("sample_index", "unknown"))
@@ -181,7 +283,7 @@ def main():
         '--seed',
         type=int,
         default=None,
-        help='随机种子（用于可重复性）'
+        help='随机种子（用于可重复性；指定时整体读入文件后采样，结果与是否安装ijson无关）'
     )
     parser.add_argument(
         '--preserve-order',
@@ -4,10 +4,202 @@
 根据分数将结果文件分流到两个文件
 以指定分数为界，将数据分为高分和低分两组
 """
-import json
+import os
+import sys
+import contextlib
+import math
+import queue
+import operator
 import argparse
+import threading
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
+from typing import Iterable, List, Dict, Any, Literal, Optional, Tuple
+
+# 作为脚本运行时（python utils/split_by_score.py）把项目根目录加入路径，以便导入utils包
+_project_root = str(Path(__file__).resolve().parent.parent)
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+
+from utils.json_io import WRITERS, load_json, stream_items
+
+# ijson为可选依赖：流式解析JSON数组，逐条分流写出，无需把整个文件读入内存
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# numpy为可选依赖：整体读入内存时用一次向量化比较完成所有记录的分类
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _open_writer(path: Path, output_format: str, pretty: bool = False):
+    """按输出格式创建写入器"""
+    return WRITERS[output_format](path, pretty=pretty)
+
+
+def _part_path(path: Path) -> Path:
+    """输出文件对应的隐藏临时文件（与输出文件同目录，重命名只修改目录项）"""
+    return path.with_name(f".{path.name}.part")
+
+
+def _write_json(path: Path, payload: Iterable[Any], output_format: str, *, pretty: bool = False) -> int:
+    """把一组记录完整写入文件，返回写入的记录数；先写临时文件，失败时不留下不完整的输出"""
+    part = _part_path(path)
+    writer = _open_writer(part, output_format, pretty)
+    try:
+        try:
+            for item in payload:
+                writer.write(item)
+        finally:
+            writer.close()
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
+    os.replace(part, path)
+    return writer.count
+
+
+# 线程间按批传递记录，减少队列加锁次数；队列有界，内存占用不随文件大小增长
+_PIPELINE_BATCH_SIZE = 256
+_PIPELINE_QUEUE_SIZE = 64
+
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> None:
+    """向有界队列放入元素；消费方已退出（stop被设置）时放弃，避免线程永久阻塞"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def _prefetch(iterable: Iterable[Any]) -> Iterable[Any]:
+    """在后台线程中读取解析iterable，按批通过有界队列交给调用方；读取线程的异常在调用方重新抛出"""
+    q = queue.Queue(_PIPELINE_QUEUE_SIZE)
+    stop = threading.Event()
+    
+    def produce():
+        try:
+            it = iter(iterable)
+            while not stop.is_set():
+                batch = list(islice(it, _PIPELINE_BATCH_SIZE))
+                if not batch:
+                    break
+                _put(q, batch, stop)
+        except BaseException as e:
+            _put(q, e, stop)
+        finally:
+            _put(q, None, stop)
+    
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            batch = q.get()
+            if batch is None:
+                return
+            if isinstance(batch, BaseException):
+                raise batch
+            yield from batch
+    finally:
+        stop.set()
+
+
+class _ThreadedWriter:
+    """在后台线程中执行写入器的序列化和写文件，调用方只负责把记录分批放入队列"""
+
+    def __init__(self, writer):
+        self.path = writer.path
+        self.count = 0
+        self._writer = writer
+        self._batch = []
+        self._error = None
+        self._q = queue.Queue(_PIPELINE_QUEUE_SIZE)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._q.get()
+            if batch is None:
+                return
+            if self._error is None:  # 出错后继续取空队列，避免调用方阻塞
+                try:
+                    for item in batch:
+                        self._writer.write(item)
+                except BaseException as e:
+                    self._error = e
+
+    def write(self, item: Any) -> None:
+        if self._error is not None:
+            raise self._error
+        self._batch.append(item)
+        self.count += 1
+        if len(self._batch) >= _PIPELINE_BATCH_SIZE:
+            self._q.put(self._batch)
+            self._batch = []
+
+    def close(self) -> None:
+        if self._batch:
+            self._q.put(self._batch)
+            self._batch = []
+        self._q.put(None)
+        self._thread.join()
+        self._writer.close()
+        if self._error is not None:
+            raise self._error
+
+
+def _read_records(input_file: Path) -> Iterable[Dict[str, Any]]:
+    """
+    返回输入文件中记录的可迭代对象：安装ijson时流式解析，否则整体读入
+    
+    输入不是JSON数组时在开始写出之前抛出ValueError
+    """
+    if ijson is None:
+        data = load_json(input_file)
+        if not isinstance(data, list):
+            raise ValueError(f"输入文件应该包含一个数组，但得到: {type(data)}")
+        return data
+    
+    with open(input_file, 'rb') as f:
+        head = f.read(64).lstrip()
+    if not head.startswith(b'['):
+        raise ValueError(f"输入文件应该包含一个数组，但开头为: {head[:16]!r}")
+    return stream_items(input_file)
+
+
+# 向量化分类的结果：(高分下标, 低分下标, 无分数下标, 高分组(最小, 最大, 总和), 低分组(最小, 最大, 总和))
+# 某组为空时对应的统计为None
+_Classified = Tuple[List[int], List[int], List[int], Optional[Tuple[float, float, float]], Optional[Tuple[float, float, float]]]
+
+
+def _classify_numpy(data: List[Dict[str, Any]], threshold: float, include_equal: bool) -> Optional[_Classified]:
+    """
+    用NumPy一次性比较所有记录的分数
+    
+    分数中有非数值（包括"0.7"这样的字符串，np.array会把它转换成浮点数）时返回None，
+    交给逐条分类处理，与逐条分类一样抛出异常
+    """
+    raw = [item.get("total_score") for item in data]
+    if not all(s is None or isinstance(s, (int, float)) for s in raw):
+        return None
+    missing = np.fromiter((s is None for s in raw), dtype=bool, count=len(raw))
+    scores = np.array([np.nan if s is None else s for s in raw], dtype=np.float64)
+    
+    high_mask = scores >= threshold if include_equal else scores > threshold
+    high_idx = np.flatnonzero(high_mask & ~missing)
+    low_idx = np.flatnonzero(~high_mask & ~missing)
+    
+    def stats(idx):
+        group = scores[idx]
+        return (float(group.min()), float(group.max()), float(group.sum())) if group.size else None
+    
+    return high_idx.tolist(), low_idx.tolist(), np.flatnonzero(missing).tolist(), stats(high_idx), stats(low_idx)
 
 
 def split_by_score(
@@ -16,106 +208,153 @@ def split_by_score(
     low_score_file: Path,
     threshold: float = 0.6,
     include_equal: bool = True,
-    include_no_score_in_high: bool = False
+    include_no_score_in_high: bool = False,
+    output_format: Literal["json", "ndjson"] = "json",
+    pretty: bool = False
 ) -> Tuple[int, int]:
     """
     根据分数将结果分流到两个文件
     
+    记录逐条分类并直接写入对应的输出文件，内存中只保留无分数记录
+    
     Args:
         input_file: 输入JSON文件路径
         high_score_file: 高分输出文件路径（>= threshold）
         low_score_file: 低分输出文件路径（< threshold）
         threshold: 分数阈值（默认0.6）
         include_equal: 等于阈值的记录是否归入高分组（默认True）
+        include_no_score_in_high: 是否将无分数记录也保存到高分文件（默认False）
+        output_format: 输出格式，"json"为JSON数组，"ndjson"为每行一条记录
+        pretty: JSON数组是否以缩进格式输出（默认紧凑格式）
         
     Returns:
         (高分记录数, 低分记录数)
     """
     # 读取输入文件
     print(f"[INFO] 读取输入文件: {input_file}")
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    if not isinstance(data, list):
-        raise ValueError(f"输入文件应该包含一个数组，但得到: {type(data)}")
-    
-    total = len(data)
-    print(f"[INFO] 总记录数: {total}")
+    records = _read_records(input_file)
     print(f"[INFO] 分数阈值: {threshold} (等于阈值{'归入' if include_equal else '不归入'}高分组)")
     
-    # 分流
-    high_score_data = []
-    low_score_data = []
+    # 输出目录只创建一次（高分、低分文件通常在同一目录，无分数文件与低分文件同目录）
+    for output_dir in {high_score_file.parent, low_score_file.parent}:
+        output_dir.mkdir(parents=True, exist_ok=True)
+    
+    # 分流（同时累计分数统计，无需再遍历结果）
+    total = 0
     no_score_data = []  # 没有分数的记录（错误记录等）
+    hi_min, hi_max, hi_sum = math.inf, -math.inf, 0.0
+    lo_min, lo_max, lo_sum = math.inf, -math.inf, 0.0
+    
+    streaming = not isinstance(records, list)
+    if streaming:
+        # 流式读取时拆成流水线：后台线程解析输入，主线程分类，两个后台线程分别写高分/低分文件
+        records = _prefetch(records)
+    
+    def open_output(path: Path):
+        writer = _open_writer(path, output_format, pretty)
+        return _ThreadedWriter(writer) if streaming else writer
     
-    for item in data:
-        total_score = item.get("total_score")
+    # 先写入隐藏的.part临时文件，全部成功后才重命名为输出文件；
+    # 中途失败（如分数不是数值）时删除临时文件，不留下看似完整的输出
+    high_part, low_part = _part_path(high_score_file), _part_path(low_score_file)
+    
+    def discard_parts(exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            high_part.unlink(missing_ok=True)
+            low_part.unlink(missing_ok=True)
+    
+    # 用ExitStack登记关闭：任一写入器打开或关闭失败时，另一个仍会被关闭；
+    # discard_parts最先登记，在两个写入器都关闭之后执行
+    with contextlib.ExitStack() as stack:
+        stack.push(discard_parts)
+        high_writer = open_output(high_part)
+        stack.callback(high_writer.close)
+        low_writer = open_output(low_part)
+        stack.callback(low_writer.close)
         
-        if total_score is None:
-            # 没有分数（可能是错误记录）
-            no_score_data.append(item)
-        elif include_equal and total_score >= threshold:
-            high_score_data.append(item)
-        elif not include_equal and total_score > threshold:
-            high_score_data.append(item)
+        # 记录已整体读入内存时用NumPy向量化分类，流式读取时逐条分类
+        classified = None
+        if isinstance(records, list) and np is not None:
+            classified = _classify_numpy(records, threshold, include_equal)
+        
+        if classified is not None:
+            high_idx, low_idx, no_score_idx, high_stats, low_stats = classified
+            total = len(records)
+            for i in high_idx:
+                high_writer.write(records[i])
+            for i in low_idx:
+                low_writer.write(records[i])
+            no_score_data = [records[i] for i in no_score_idx]
+            if high_stats:
+                hi_min, hi_max, hi_sum = high_stats
+            if low_stats:
+                lo_min, lo_max, lo_sum = low_stats
         else:
-            low_score_data.append(item)
+            # 热循环中用到的方法和比较函数预先绑定为局部变量，省去每条记录的属性查找
+            get = dict.get
+            is_high = operator.ge if include_equal else operator.gt
+            write_high, write_low = high_writer.write, low_writer.write
+            append_no_score = no_score_data.append
+            
+            for item in records:
+                total += 1
+                total_score = get(item, "total_score")
+                
+                if total_score is None:
+                    # 没有分数（可能是错误记录）
+                    append_no_score(item)
+                elif is_high(total_score, threshold):
+                    write_high(item)
+                    if total_score < hi_min:
+                        hi_min = total_score
+                    if total_score > hi_max:
+                        hi_max = total_score
+                    hi_sum += total_score
+                else:
+                    write_low(item)
+                    if total_score < lo_min:
+                        lo_min = total_score
+                    if total_score > lo_max:
+                        lo_max = total_score
+                    lo_sum += total_score
+        
+        high_count, low_count = high_writer.count, low_writer.count
+        # 可以选择是否将无分数记录也保存到高分文件
+        if include_no_score_in_high:
+            for item in no_score_data:
+                high_writer.write(item)
+    
+    os.replace(high_part, high_score_file)
+    os.replace(low_part, low_score_file)
     
     # 打印统计信息
+    print(f"[INFO] 总记录数: {total}")
     print(f"\n[统计] 分流结果:")
-    print(f"  高分组 (>= {threshold}): {len(high_score_data)} 条")
-    print(f"  低分组 (< {threshold}): {len(low_score_data)} 条")
+    print(f"  高分组 (>= {threshold}): {high_count} 条")
+    print(f"  低分组 (< {threshold}): {low_count} 条")
     print(f"  无分数记录: {len(no_score_data)} 条")
     
-    if high_score_data:
-        high_scores = [item.get("total_score", 0) for item in high_score_data if "total_score" in item]
-        if high_scores:
-            print(f"  高分组分数范围: {min(high_scores):.3f} - {max(high_scores):.3f}")
-            print(f"  高分组平均分数: {sum(high_scores) / len(high_scores):.3f}")
+    if high_count:
+        print(f"  高分组分数范围: {hi_min:.3f} - {hi_max:.3f}")
+        print(f"  高分组平均分数: {hi_sum / high_count:.3f}")
     
-    if low_score_data:
-        low_scores = [item.get("total_score", 0) for item in low_score_data if "total_score" in item]
-        if low_scores:
-            print(f"  低分组分数范围: {min(low_scores):.3f} - {max(low_scores):.3f}")
-            print(f"  低分组平均分数: {sum(low_scores) / len(low_scores):.3f}")
+    if low_count:
+        print(f"  低分组分数范围: {lo_min:.3f} - {lo_max:.3f}")
+        print(f"  低分组平均分数: {lo_sum / low_count:.3f}")
     
-    # 保存高分文件
-    if high_score_data or no_score_data:
-        # 可以选择是否将无分数记录也保存到高分文件
-        high_output = high_score_data + (no_score_data if include_no_score_in_high else [])
-        
-        high_score_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(high_score_file, 'w', encoding='utf-8') as f:
-            json.dump(high_output, f, ensure_ascii=False, indent=2)
-        print(f"[INFO] 高分组已保存到: {high_score_file} ({len(high_output)} 条)")
-    else:
-        # 创建空文件
-        high_score_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(high_score_file, 'w', encoding='utf-8') as f:
-            json.dump([], f, ensure_ascii=False, indent=2)
-        print(f"[INFO] 高分组为空，已创建空文件: {high_score_file}")
-    
-    # 保存低分文件
-    if low_score_data:
-        low_score_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(low_score_file, 'w', encoding='utf-8') as f:
-            json.dump(low_score_data, f, ensure_ascii=False, indent=2)
-        print(f"[INFO] 低分组已保存到: {low_score_file} ({len(low_score_data)} 条)")
-    else:
-        # 创建空文件
-        low_score_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(low_score_file, 'w', encoding='utf-8') as f:
-            json.dump([], f, ensure_ascii=False, indent=2)
-        print(f"[INFO] 低分组为空，已创建空文件: {low_score_file}")
+    for label, writer, output_file in (("高分组", high_writer, high_score_file), ("低分组", low_writer, low_score_file)):
+        if writer.count:
+            print(f"[INFO] {label}已保存到: {output_file} ({writer.count} 条)")
+        else:
+            print(f"[INFO] {label}为空，已创建空文件: {output_file}")
     
     # 如果需要，单独保存无分数记录
     if no_score_data and not include_no_score_in_high:
         no_score_file = low_score_file.parent / f"{low_score_file.stem}_no_score{low_score_file.suffix}"
-        with open(no_score_file, 'w', encoding='utf-8') as f:
-            json.dump(no_score_data, f, ensure_ascii=False, indent=2)
-        print(f"[INFO] 无分数记录已保存到: {no_score_file} ({len(no_score_data)} 条)")
+        count = _write_json(no_score_file, no_score_data, output_format, pretty=pretty)
+        print(f"[INFO] 无分数记录已保存到: {no_score_file} ({count} 条)")
     
-    return len(high_score_data), len(low_score_data)
+    return high_count, low_count
 
 
 def main():
@@ -136,6 +375,9 @@ def main():
   
   # 将无分数记录也保存到高分文件
   python utils/split_by_score.py results.json high.json low.json --include-no-score
+  
+  # 输出NDJSON（每行一条记录）
+  python utils/split_by_score.py results.json high.ndjson low.ndjson --format ndjson
         """
     )
     
@@ -170,6 +412,17 @@ def main():
         action='store_true',
         help='将无分数记录（错误记录等）也保存到高分文件（默认不保存）'
     )
+    parser.add_argument(
+        '--format',
+        choices=sorted(WRITERS),
+        default='json',
+        help='输出格式：json为JSON数组，ndjson为每行一条记录（默认: json）'
+    )
+    parser.add_argument(
+        '--pretty',
+        action='store_true',
+        help='以缩进格式输出JSON数组，便于人工查看（默认紧凑格式，每行一条记录）'
+    )
     
     args = parser.parse_args()
     
@@ -192,7 +445,9 @@ def main():
             low_score_file=low_score_file,
             threshold=args.threshold,
             include_equal=not args.exclude_equal,
-            include_no_score_in_high=args.include_no_score
+            include_no_score_in_high=args.include_no_score,
+            output_format=args.format,
+            pretty=args.pretty
         )
         
         print(f"\n[完成] 分流完成！高分组: {high_count} 条，低分组: {low_count} 条")
@@ -3,101 +3,256 @@
 """
 将大JSON文件分割成多个小文件，用于分段处理
 """
-import json
+import os
+import re
+import sys
+import glob
+import fnmatch
 import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, count, islice
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal, Optional
+
+# 作为脚本运行时（python utils/split_json.py）把项目根目录加入路径，以便导入utils包
+_project_root = str(Path(__file__).resolve().parent.parent)
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+
+from utils.json_io import WRITERS, open_input, loads, load_json, stream_items
+
+# ijson为可选依赖：流式解析JSON数组，分割时内存中只保留当前写出的一条记录
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# 按后缀识别的NDJSON文件（每行一条记录）
+_NDJSON_SUFFIXES = ('.ndjson', '.jsonl')
+
+
+def _load_records(path: Path) -> List[Any]:
+    """读取结果文件中的记录：NDJSON逐行解析，JSON数组直接返回，单个对象包装为列表"""
+    if path.suffix in _NDJSON_SUFFIXES:
+        with open_input(path) as f:
+            return [loads(line) for line in f if line.strip()]
+    data = load_json(path)
+    return data if isinstance(data, list) else [data]
+
+
+def _check_json_array(input_file: Path) -> None:
+    """只读取文件开头，确认输入是JSON数组"""
+    with open(input_file, 'rb') as f:
+        head = f.read(64).lstrip()
+    if not head.startswith(b'['):
+        raise ValueError(f"输入文件应该包含一个数组，但开头为: {head[:16]!r}")
+
+
+def _write_chunk(writer_cls: type, output_file: Path, batch: List[Any], pretty: bool = False) -> int:
+    """把一个分块的记录写入文件，返回写入的记录数"""
+    writer = writer_cls(output_file, pretty=pretty)
+    try:
+        for item in batch:
+            writer.write(item)
+    finally:
+        writer.close()
+    return writer.count
 
 
 def split_json(
     input_file: Path,
     output_dir: Path,
     chunk_size: int = 1000,
-    prefix: str = "chunk"
+    prefix: str = "chunk",
+    output_format: Literal["json", "ndjson"] = "json",
+    max_workers: Optional[int] = None,
+    pretty: bool = False
 ) -> List[Path]:
     """
     将JSON文件分割成多个小文件
     
+    安装ijson时流式读取、边读边写，内存占用与文件大小无关；
+    分块先写为隐藏的.part临时文件，全部写完后才统一重命名为 {prefix}_NNNN_of_NNNN，中途失败时删除已写出的临时文件，
+    输出目录中不会留下不完整的分块
+    
     Args:
         input_file: 输入JSON文件路径
         output_dir: 输出目录
         chunk_size: 每个文件包含的记录数
         prefix: 输出文件前缀
+        output_format: 输出格式，"json"为JSON数组，"ndjson"为每行一条记录（后缀.ndjson）
+        max_workers: 并行写分块文件的线程数（默认: CPU核数）
+        pretty: JSON数组是否以缩进格式输出（默认紧凑格式）
         
     Returns:
         输出文件路径列表
     """
     print(f"[INFO] 读取输入文件: {input_file}")
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    if not isinstance(data, list):
-        raise ValueError(f"输入文件应该包含一个数组，但得到: {type(data)}")
+    if ijson is not None:
+        _check_json_array(input_file)
+        records = stream_items(input_file)
+    else:
+        data = load_json(input_file)
+        if not isinstance(data, list):
+            raise ValueError(f"输入文件应该包含一个数组，但得到: {type(data)}")
+        records = iter(data)  # 按块依次消费，不再对整个列表切片
     
-    total = len(data)
-    print(f"[INFO] 总记录数: {total}")
     print(f"[INFO] 每个文件包含: {chunk_size} 条记录")
     
+    def part_name(i: int) -> Path:
+        return output_dir / f".{prefix}_{i+1:08d}{writer_cls.suffix}.part"
+    
+    def chunk_name(i: int, num_chunks: int) -> Path:
+        return output_dir / f"{prefix}_{i+1:04d}_of_{num_chunks:04d}{writer_cls.suffix}"
+    
     # 创建输出目录
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    # 计算需要多少个文件
-    num_chunks = (total + chunk_size - 1) // chunk_size  # 向上取整
-    print(f"[INFO] 将分割为 {num_chunks} 个文件")
+    writer_cls = WRITERS[output_format]
+    max_workers = max_workers or os.cpu_count() or 1
+    written = []  # [(写出的文件, 记录数)]，按分块顺序
     
-    output_files = []
+    def finish(chunk_file: Path, future) -> None:
+        written.append((chunk_file, future.result()))
     
-    for i in range(num_chunks):
-        start_idx = i * chunk_size
-        end_idx = min((i + 1) * chunk_size, total)
-        
-        chunk_data = data[start_idx:end_idx]
-        
-        # 生成输出文件名
-        output_file = output_dir / f"{prefix}_{i+1:04d}_of_{num_chunks:04d}.json"
-        
-        # 保存文件
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(chunk_data, f, ensure_ascii=False, indent=2)
-        
+    # 主线程读取并切出分块，写文件交给线程池；在途分块数有上限，内存占用不随文件大小增长
+    submitted = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()
+            for i in count():
+                batch = list(islice(records, chunk_size))
+                if not batch:
+                    break
+                chunk_file = part_name(i)
+                pending.append((chunk_file, executor.submit(_write_chunk, writer_cls, chunk_file, batch, pretty)))
+                submitted += 1
+                if len(pending) >= max_workers * 2:
+                    finish(*pending.popleft())
+            # 按提交顺序收集结果，保证分块顺序不变
+            while pending:
+                finish(*pending.popleft())
+    except BaseException:
+        # 读取或写出失败：删除已写出的临时文件（退出with时线程池已等待所有在途分块结束）
+        for i in range(submitted):
+            part_name(i).unlink(missing_ok=True)
+        raise
+    
+    num_chunks = len(written)
+    print(f"[INFO] 总记录数: {sum(n for _, n in written)}")
+    print(f"[INFO] 共分割为 {num_chunks} 个文件")
+    
+    # 全部分块写完后重命名为最终文件名（同目录内重命名只修改目录项）
+    output_files = []
+    for i, (chunk_file, n) in enumerate(written):
+        output_file = chunk_name(i, num_chunks)
+        os.replace(chunk_file, output_file)
         output_files.append(output_file)
-        print(f"[INFO] 已创建: {output_file.name} ({len(chunk_data)} 条记录)")
+        print(f"[INFO] 已创建: {output_file.name} ({n} 条记录)")
     
     print(f"\n[完成] 共创建 {len(output_files)} 个文件")
     return output_files
 
 
+def _concat_ndjson(input_files: List[Path], output_file: Path) -> int:
+    """直接拼接NDJSON文件的字节内容（不做解析/序列化），返回记录行数"""
+    count = 0
+    with open(output_file, 'wb') as out:
+        for input_file in input_files:
+            print(f"[INFO] 读取: {input_file.name}")
+            last = b'\n'
+            with open_input(input_file) as f:
+                while True:
+                    block = f.read(1 << 20)
+                    if not block:
+                        break
+                    out.write(block)
+                    count += block.count(b'\n')
+                    last = block[-1:]
+            # 文件末尾缺少换行时补上，避免与下一个文件的首行连在一起
+            if last != b'\n':
+                out.write(b'\n')
+                count += 1
+    return count
+
+
+def _expand_patterns(patterns: List[str]) -> List[Path]:
+    """
+    展开命令行传入的文件通配符，返回排序后的文件列表
+    
+    每个模式只扫描一次所在目录（os.scandir），用预编译的正则匹配文件名；
+    与glob一致，*和?不匹配以.开头的隐藏文件（如分割时的临时文件）
+    """
+    matched = []
+    for pattern in patterns:
+        parent, name = os.path.split(pattern)
+        if glob.has_magic(parent):
+            matched.extend(glob.glob(pattern))  # 目录部分也带通配符时交给glob处理
+            continue
+        if not glob.has_magic(name):
+            if os.path.exists(pattern):
+                matched.append(pattern)
+            continue
+        
+        name_re = re.compile(fnmatch.translate(name))
+        include_hidden = name.startswith('.')
+        try:
+            with os.scandir(parent or '.') as entries:
+                for entry in entries:
+                    if name_re.match(entry.name) and (include_hidden or not entry.name.startswith('.')):
+                        matched.append(os.path.join(parent, entry.name) if parent else entry.name)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+    
+    matched.sort()  # 排序确保顺序
+    return [Path(p) for p in matched]
+
+
 def merge_results(
     input_files: List[Path],
-    output_file: Path
+    output_file: Path,
+    output_format: Literal["json", "ndjson"] = "json",
+    max_workers: Optional[int] = None,
+    pretty: bool = False
 ) -> None:
     """
     合并多个结果文件
     
+    输入可以是JSON数组或NDJSON（按后缀.ndjson/.jsonl识别）；
+    输入和输出都是NDJSON时直接拼接文件内容
+    
     Args:
         input_files: 输入文件列表
         output_file: 输出文件路径
+        output_format: 输出格式，"json"为JSON数组，"ndjson"为每行一条记录
+        max_workers: 并行读取输入文件的线程数（默认: CPU核数）
+        pretty: JSON数组是否以缩进格式输出（默认紧凑格式）
     """
     print(f"[INFO] 开始合并 {len(input_files)} 个文件")
+    output_file.parent.mkdir(parents=True, exist_ok=True)
     
-    all_results = []
+    if output_format == "ndjson" and all(p.suffix in _NDJSON_SUFFIXES for p in input_files):
+        count = _concat_ndjson(input_files, output_file)
+        print(f"[完成] 已合并 {count} 条记录到: {output_file}")
+        return
     
-    for input_file in input_files:
-        print(f"[INFO] 读取: {input_file.name}")
-        with open(input_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        if isinstance(data, list):
-            all_results.extend(data)
-        else:
-            all_results.append(data)
+    # 多个文件并行读取解析，executor.map按输入顺序返回结果
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as executor:
+        loaded = []
+        for input_file, records in zip(input_files, executor.map(_load_records, input_files)):
+            print(f"[INFO] 读取: {input_file.name}")
+            loaded.append(records)
     
-    # 保存合并结果
-    output_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(all_results, f, ensure_ascii=False, indent=2)
+    # 保存合并结果（按文件顺序依次写出，不再拼接成一个大列表）
+    writer = WRITERS[output_format](output_file, pretty=pretty)
+    try:
+        for item in chain.from_iterable(loaded):
+            writer.write(item)
+    finally:
+        writer.close()
     
-    print(f"[完成] 已合并 {len(all_results)} 条记录到: {output_file}")
+    print(f"[完成] 已合并 {writer.count} 条记录到: {output_file}")
 
 
 def main():
@@ -115,6 +270,10 @@ def main():
   
   # 分割并指定前缀
   python utils/split_json.py split input.json output_dir/ -s 500 -p batch
+  
+  # 分割为NDJSON，合并时直接拼接
+  python utils/split_json.py split input.json output_dir/ --format ndjson
+  python utils/split_json.py merge output_dir/*.ndjson merged.ndjson --format ndjson
         """
     )
     
@@ -128,12 +287,24 @@ def main():
                              help='每个文件包含的记录数（默认: 1000）')
     split_parser.add_argument('-p', '--prefix', type=str, default='chunk',
                              help='输出文件前缀（默认: chunk）')
+    split_parser.add_argument('-w', '--workers', type=int, default=None,
+                             help='并行写分块文件的线程数（默认: CPU核数）')
+    split_parser.add_argument('--pretty', action='store_true',
+                             help='以缩进格式输出JSON数组，便于人工查看（默认紧凑格式，每行一条记录）')
+    split_parser.add_argument('--format', choices=sorted(WRITERS), default='json',
+                             help='输出格式：json为JSON数组，ndjson为每行一条记录（默认: json）')
     
     # 合并命令
     merge_parser = subparsers.add_parser('merge', help='合并JSON文件')
     merge_parser.add_argument('input_files', type=str, nargs='+',
                              help='输入JSON文件路径（支持通配符）')
     merge_parser.add_argument('output_file', type=str, help='输出JSON文件路径')
+    merge_parser.add_argument('--format', choices=sorted(WRITERS), default='json',
+                             help='输出格式：json为JSON数组，ndjson为每行一条记录（默认: json）')
+    merge_parser.add_argument('-w', '--workers', type=int, default=None,
+                             help='并行读取输入文件的线程数（默认: CPU核数）')
+    merge_parser.add_argument('--pretty', action='store_true',
+                             help='以缩进格式输出JSON数组，便于人工查看（默认紧凑格式，每行一条记录）')
     
     args = parser.parse_args()
     
@@ -150,12 +321,17 @@ def main():
                 input_file=input_file,
                 output_dir=output_dir,
                 chunk_size=args.chunk_size,
-                prefix=args.prefix
+                prefix=args.prefix,
+                output_format=args.format,
+                max_workers=args.workers,
+                pretty=args.pretty
             )
             
-            print(f"\n[提示] 可以使用以下命令逐个处理:")
-            for i, output_file in enumerate(output_files, 1):
-                print(f"  python main.py --json {output_file} --output results_{i:04d}.json")
+            # main.py只接受JSON数组输入
+            if args.format == 'json':
+                print(f"\n[提示] 可以使用以下命令逐个处理:")
+                for i, output_file in enumerate(output_files, 1):
+                    print(f"  python main.py --json {output_file} --output results_{i:04d}.json")
             
         except Exception as e:
             print(f"[ERROR] 处理失败: {e}")
@@ -163,15 +339,8 @@ def main():
             traceback.print_exc()
     
     elif args.command == 'merge':
-        import glob
-        
         # 处理通配符
-        input_files = []
-        for pattern in args.input_files:
-            input_files.extend(glob.glob(pattern))
-        
-        input_files = [Path(f) for f in input_files]
-        input_files.sort()  # 排序确保顺序
+        input_files = _expand_patterns(args.input_files)
         
         if not input_files:
             print(f"[ERROR] 未找到输入文件")
@@ -180,7 +349,8 @@ def main():
         output_file = Path(args.output_file)
         
         try:
-            merge_results(input_files, output_file)
+            merge_results(input_files, output_file, output_format=args.format,
+                          max_workers=args.workers, pretty=args.pretty)
         except Exception as e:
             print(f"[ERROR] 处理失败: {e}")
             import traceback